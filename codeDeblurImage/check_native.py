@@ -0,0 +1,37 @@
+# Build check of deblur_native (make check).
+# Deblurs a small synthetic image twice in one process and compares the
+# results (the FFT plans cached in fft.hpp are reused by the second call),
+# then saves the FFTW wisdom and checks that the file holds plans and not
+# only the header (tvreg.c used to wipe them with fftwf_cleanup).
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+import deblur
+
+if __name__ == "__main__":
+    if (not deblur.available()):
+        sys.exit("deblur_native can not be imported, run make deblur_native")
+
+    rng = np.random.default_rng(0)
+    img = np.zeros((64, 64), np.uint8)
+    img[16:48, 16:48] = 200
+    img = np.clip(img + rng.normal(0, 5, img.shape), 0, 255).astype(np.uint8)
+
+    _, hasil1 = deblur.deblur_image(img, 7, 9, multiscale=False)
+    _, hasil2 = deblur.deblur_image(img, 7, 9, multiscale=False)
+    if (hasil1.shape != img.shape or not np.array_equal(hasil1, hasil2)):
+        sys.exit("two deblurs of the same image in one process differ")
+
+    with tempfile.TemporaryDirectory() as wisdom_dir:
+        if (not deblur.save_wisdom(wisdom_dir, img.shape[1], img.shape[0])):
+            sys.exit("no wisdom file written")
+        ukuran = sum(os.path.getsize(os.path.join(wisdom_dir, f)) for f in os.listdir(wisdom_dir))
+        # an empty wisdom file is only its header line (about 70 bytes)
+        if (ukuran < 200):
+            sys.exit(f"the wisdom file has no plans ({ukuran} bytes), rebuild the objects (make clean)")
+
+    print("deblur_native OK")
@@ -1,8 +1,20 @@
 import subprocess
 import os
 import glob
+import cv2
 from PIL import Image
 import time
+import sys
+
+# file_index.py is in codePython
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "codePython"))
+from file_index import image_paths
+from manifest import Manifest, manifest_path
+from stage_timer import StageLog, profile_call, timed
+
+import deblur
+from deblur_scheduler import DeblurJob, DeblurScheduler, wisdom_args, estimate_command, deconv_command, run_stage
+from video_deblur import KernelReuse, frame_order
 
 def name_of_time(tm):
     hasil = ""
@@ -12,20 +24,12 @@ def name_of_time(tm):
         tmp = tm % 60
         if(i >= len(waktu)):
             break
-        hasil = f" {int(round(tmp))} {waktu[i]}" + hasil
+        # the seconds keep 2 decimals
+        hasil = (f" {tmp:.2f} {waktu[i]}" if i == 0 else f" {int(tmp)} {waktu[i]}") + hasil
         i += 1
         tm = tm // 60
     return hasil
 
-def get_image_files(directory):
-    image_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff')
-    image_files = []
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.lower().endswith(image_extensions):
-                image_files.append(os.path.join(root, file))
-    return image_files
-
 ## Directory Location and filename image file
 #file_name = "codeDeblurImage/ezgif-frame-050.jpg"
 
@@ -51,37 +55,280 @@ com[0] = "sudo"
 com1[0] = "sudo"
 
 
-image_file_arr = get_image_files(dir_name)
+image_file_arr = image_paths(dir_name)
 
 awal = 0
 akhir = len(image_file_arr)
 
+## Deblur inside this process with deblur_native (make deblur_native) instead of
+## running estimate-kernel and deconv for every image
+in_process = False
+
+if (in_process and not deblur.available()):
+    print("deblur_native is not built (make deblur_native), using the commands")
+    in_process = False
+
+## Skip images that are already deblurred with the same parameters (False = process all again)
+resume = True
+
+## Video frames (hasil_video/<video>_frames from ekstrakImage.py): estimate the kernel only
+## on key frames and reuse it for the frames in between (one image after another)
+video_mode = False
+
+## Estimate at least every n frames, again when the blur drifted away from the key frame
+## (see video_deblur.py), and at a cut (mean gray difference with the previous frame above cut_threshold)
+kernel_every = 10
+drift = 0.1
+cut_threshold = 30
+
+## Iterations of an estimation that starts from the previous kernel (5 = like a new one)
+warm_iterations = 2
+
+params = {"kernel_size": 7, "multiscale": False, "alpha": 9}
+if (video_mode):
+    params["video"] = {"kernel_every": kernel_every, "drift": drift,
+                       "cut_threshold": cut_threshold, "warm_iterations": warm_iterations}
+
+# Every finished image is written to the manifest next to res_loc
+manifest = Manifest(manifest_path(res_loc), params)
+
+## Number of images deblurred at the same time (1 = one after another)
+parallel = 1
+
+# in_process and video_mode deblur one image after another in this process
+if (parallel > 1 and (in_process or video_mode)):
+    print(f"parallel = {parallel} needs in_process = False and video_mode = False, "
+          f"the images are deblurred one after another")
+    parallel = 1
+
+## OpenMP threads per image and memory limit in MB for all running images (None = no limit)
+threads_per_image = None
+max_memory_mb = None
+
+## Directory of the FFTW wisdom files, one per image size (None = measure the FFT plans in every run)
+wisdom_dir = res_loc + "/wisdom"
+
+## With parallel > 1: deblur the first image of every size alone first, so its wisdom is ready for the others
+warm_up = True
+
+if (wisdom_dir and not os.path.exists(wisdom_dir)):
+    os.makedirs(wisdom_dir)
+
+## Seconds of every stage of every image (decode, estimate, deconv, write) as JSON lines
+## (None = only the table printed at the end)
+timings_file = res_loc + "/timings.jsonl"
+
+## Run the first image under cProfile and tracemalloc and save the profile in this file
+## (None = no profile; only with in_process, the commands run outside Python)
+profile_file = None
+
+if (profile_file and not in_process):
+    print("profile_file needs in_process, no profile")
+    profile_file = None
+
+timings = StageLog(timings_file)
+
+# Images that still have to be deblurred
+todo = []
 for i in range(awal, akhir):
     image_file = image_file_arr[i]
-    
-    print(f"Proses Citra ke-{i} = {image_file}")
-
-    time_start = time.time()
-
-    #Estimate the kernel
-    file_name = image_file
-    com[1] = "codeDeblurImage/estimate-kernel" # command estimate kernel
-    com[2] = str(7) # kernel size
-    com[3] = file_name # filename to process
-    com[4] = res_loc + "/" + "kernel-" + str(i) + ".tif" # kernel name and location directory
-    com[5] = "--no-multiscale"
-    subprocess.run(com)
-
-    end1 = time.time()
-    print(f"Subprocess siap = {name_of_time(end1 - time_start)}")
-
-    ## Deblurring Image
-    com1[1] = "codeDeblurImage/deconv" # command deblurring image
-    com1[2] = file_name # filename to process
-    com1[3] = res_loc + "/" + "kernel-" + str(i) + ".tif" # kernel name and location directory
-    com1[4] = res_loc + "/" + file_name_res + "-" + str(i) + ".png" # result file
-    com1[5] = "--alpha=" + str(9)
-    subprocess.run(com1)
-
-    end2 = time.time()
-    print(f"Deblurring siap = {name_of_time(end2 - end1)}\n")
\ No newline at end of file
+    key = os.path.relpath(image_file, dir_name)
+
+    if (resume and manifest.done(key, [image_file], res_loc + "/" + file_name_res + "-" + str(i) + ".png")):
+        print(f"Citra ke-{i} sudah diproses = {image_file}")
+        continue
+    todo.append((i, image_file, key))
+
+# Estimate the kernel of a frame, starting from the kernel init if given.
+# Return the kernel (array in_process, else its file), None if it failed
+def estimate_frame(job, img, init=None, times=None):
+    if (in_process):
+        try:
+            with timed(times, "estimate"):
+                if (init is None):
+                    return deblur.estimate_kernel(img, 7, False)
+                return deblur.estimate_kernel(img, 7, False, init_kernel=init, iterations=warm_iterations)
+        except (RuntimeError, ValueError) as e:
+            print(e)
+            return None
+    with timed(times, "estimate"):
+        proses = run_stage("estimate", ["sudo"] + estimate_command(job, 7, False, wisdom_dir, init,
+                                                                  warm_iterations if init else None))
+    if (proses.returncode != 0):
+        print(proses.stderr)
+        return None
+    return job.kernel_file
+
+# Deblur a frame with a kernel and write job.result_file. Return True if it worked
+def deconv_frame(job, img, kernel, times=None):
+    if (in_process):
+        try:
+            with timed(times, "deconv"):
+                hasil = deblur.to_uint8(deblur.deconv(img, kernel, 9))
+            with timed(times, "write"):
+                return cv2.imwrite(job.result_file, hasil)
+        except (RuntimeError, ValueError, cv2.error) as e:
+            print(e)
+            return False
+    with timed(times, "deconv"):
+        proses = run_stage("deconv", ["sudo"] + deconv_command(job._replace(kernel_file=kernel), 9, wisdom_dir))
+    if (proses.returncode != 0):
+        print(proses.stderr)
+    return proses.returncode == 0
+
+if (video_mode):
+    reuse = KernelReuse(kernel_every, drift, cut_threshold)
+    jumlah = 0
+    jumlah_estimasi = 0
+    time_awal = time.perf_counter()
+
+    # frames of one clip one after another, in frame order
+    for i, image_file, key in sorted(todo, key=lambda t: frame_order(t[1])):
+        time_start = time.perf_counter()
+        waktu = {}
+        job = DeblurJob(i, image_file, res_loc + "/" + "kernel-" + str(i) + ".tif",
+                        res_loc + "/" + file_name_res + "-" + str(i) + ".png")
+        with timed(waktu, "decode"):
+            img = cv2.imread(image_file)
+        if (img is None):
+            print(f"Citra ke-{i} gagal dibaca = {image_file}\n")
+            continue
+
+        with timed(waktu, "reuse"):
+            estimasi = reuse.need_estimate(image_file, img)
+        if (estimasi):
+            kernel = estimate_frame(job, img, reuse.kernel if reuse.warm else None, waktu)
+            jumlah_estimasi += 1
+            if (kernel is not None):
+                reuse.estimated(kernel)
+        else:
+            kernel = reuse.kernel
+
+        if (kernel is None or not deconv_frame(job, img, kernel, waktu)):
+            print(f"Citra ke-{i} gagal = {image_file}\n")
+            timings.add(key, waktu, time.perf_counter() - time_start, ok=False)
+            continue
+
+        asal = f"kernel baru, {reuse.alasan}" if estimasi else "kernel dipakai ulang"
+        lama = time.perf_counter() - time_start
+        timings.add(key, waktu, lama, ok=True, new_kernel=estimasi)
+        print(f"Citra ke-{i} siap = {image_file} ({asal}), {name_of_time(lama)}")
+        manifest.record(key, [image_file], job.result_file, kernel=kernel if not in_process else None)
+        jumlah += 1
+
+    lama = time.perf_counter() - time_awal
+    print(f"\nSelesai = {jumlah} citra, gagal = {len(todo) - jumlah}, {jumlah_estimasi} estimasi kernel, "
+          f"waktu = {name_of_time(lama)}")
+elif (parallel > 1 and not in_process):
+    # estimate-kernel and deconv of several images at the same time
+    jobs = [DeblurJob(i, image_file, res_loc + "/" + "kernel-" + str(i) + ".tif",
+                      res_loc + "/" + file_name_res + "-" + str(i) + ".png") for i, image_file, _ in todo]
+    keys = {i: key for i, _, key in todo}
+
+    def selesai(hasil):
+        job = hasil.job
+        waktu = ", ".join(f"{s.name} = {name_of_time(s.seconds)}" for s in hasil.stages)
+        timings.add(keys[job.i], {s.name: s.seconds for s in hasil.stages}, hasil.seconds, ok=hasil.ok)
+        if (hasil.ok):
+            print(f"Citra ke-{job.i} siap = {job.image_file} ({waktu})")
+            manifest.record(keys[job.i], [job.image_file], job.result_file, kernel=job.kernel_file)
+        else:
+            kode = ", ".join(f"{s.name} = {s.returncode}" for s in hasil.stages)
+            print(f"Citra ke-{job.i} gagal = {job.image_file} ({kode}), lihat {res_loc}/logs/{job.i}.log")
+
+    max_memory = max_memory_mb * 1024 * 1024 if max_memory_mb else None
+    scheduler = DeblurScheduler(parallel, threads_per_image, max_memory, ["sudo"], 7, 9, False, res_loc + "/logs",
+                                wisdom_dir)
+    jumlah, gagal, lama = scheduler.run(jobs, selesai, warm_up=warm_up)
+    print(f"\nSelesai = {jumlah} citra, gagal = {gagal}, waktu = {name_of_time(lama)}, "
+          f"{(jumlah + gagal) / lama if lama > 0 else 0:.3f} citra/detik")
+else:
+    # image sizes whose wisdom is loaded in this process (in_process)
+    ukuran_wisdom = set()
+
+    for i, image_file, key in todo:
+        print(f"Proses Citra ke-{i} = {image_file}")
+
+        time_start = time.perf_counter()
+        waktu = {}
+
+        if (in_process):
+            # The kernel stays in memory, only the result is written
+            result_file = res_loc + "/" + file_name_res + "-" + str(i) + ".png"
+            with timed(waktu, "decode"):
+                img = cv2.imread(image_file)
+            if (img is None):
+                print(f"Citra ke-{i} gagal dibaca = {image_file}\n")
+                timings.add(key, waktu, time.perf_counter() - time_start, ok=False)
+                continue
+            # A failed image is not written to the manifest, so resume retries it
+            try:
+                h, w = img.shape[:2]
+                baru = wisdom_dir and (w, h) not in ukuran_wisdom
+                if (baru):
+                    with timed(waktu, "wisdom"):
+                        deblur.load_wisdom(wisdom_dir, w, h)
+                    ukuran_wisdom.add((w, h))
+                if (profile_file):
+                    print(f"Profiling {image_file}")
+                    _, hasil = profile_call(deblur.deblur_image, img, 7, 9, False, output=profile_file)
+                    # its stage times are not counted (cProfile slows it down)
+                    profile_file = waktu = None
+                else:
+                    with timed(waktu, "estimate"):
+                        kernel = deblur.estimate_kernel(img, 7, False)
+                    with timed(waktu, "deconv"):
+                        hasil = deblur.to_uint8(deblur.deconv(img, kernel, 9))
+                if (baru):
+                    with timed(waktu, "wisdom"):
+                        deblur.save_wisdom(wisdom_dir, w, h)
+                with timed(waktu, "write"):
+                    if (not cv2.imwrite(result_file, hasil)):
+                        raise RuntimeError(f"cannot write {result_file}")
+            except (RuntimeError, ValueError, cv2.error) as e:
+                print(f"Citra ke-{i} gagal = {image_file} ({e})\n")
+                if (waktu is not None):
+                    timings.add(key, waktu, time.perf_counter() - time_start, ok=False)
+                continue
+            lama = time.perf_counter() - time_start
+            print(f"Deblurring siap = {name_of_time(lama)}\n")
+            if (waktu is not None):
+                timings.add(key, waktu, lama, ok=True)
+            manifest.record(key, [image_file], result_file)
+            continue
+
+        #Estimate the kernel
+        file_name = image_file
+        com[1] = "codeDeblurImage/estimate-kernel" # command estimate kernel
+        com[2] = str(7) # kernel size
+        com[3] = file_name # filename to process
+        com[4] = res_loc + "/" + "kernel-" + str(i) + ".tif" # kernel name and location directory
+        com[5] = "--no-multiscale"
+        with timed(waktu, "estimate"):
+            proses1 = subprocess.run(com + wisdom_args(wisdom_dir))
+
+        end1 = time.perf_counter()
+        print(f"Subprocess siap = {name_of_time(end1 - time_start)}")
+
+        ## Deblurring Image
+        com1[1] = "codeDeblurImage/deconv" # command deblurring image
+        com1[2] = file_name # filename to process
+        com1[3] = res_loc + "/" + "kernel-" + str(i) + ".tif" # kernel name and location directory
+        com1[4] = res_loc + "/" + file_name_res + "-" + str(i) + ".png" # result file
+        com1[5] = "--alpha=" + str(9)
+        with timed(waktu, "deconv"):
+            proses2 = subprocess.run(com1 + wisdom_args(wisdom_dir))
+
+        end2 = time.perf_counter()
+        print(f"Deblurring siap = {name_of_time(end2 - end1)}\n")
+        timings.add(key, waktu, end2 - time_start, ok=proses1.returncode == 0 and proses2.returncode == 0)
+
+        # Only a successful image counts as done
+        if (proses1.returncode == 0 and proses2.returncode == 0):
+            manifest.record(key, [image_file], com1[4], kernel=com[4])
+        else:
+            print(f"Citra ke-{i} gagal: estimate-kernel = {proses1.returncode}, deconv = {proses2.returncode}\n")
+
+timings.close()
+print("\n" + timings.report())
+manifest.close()
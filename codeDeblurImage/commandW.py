@@ -3,6 +3,11 @@ import os
 import glob
 from PIL import Image
 import time
+import sys
+
+# file_index.py is in codePython
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "codePython"))
+from file_index import image_paths
 
 def name_of_time(tm):
     hasil = ""
@@ -17,15 +22,6 @@ def name_of_time(tm):
         tm = tm // 60
     return hasil
 
-def get_image_files(directory):
-    image_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff')
-    image_files = []
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.lower().endswith(image_extensions):
-                image_files.append(os.path.join(root, file))
-    return image_files
-
 ## Directory Location and filename image file
 #file_name = "codeDeblurImage/ezgif-frame-050.jpg"
 
@@ -51,7 +47,7 @@ com[0] = "sudo"
 com1[0] = "sudo"
 
 
-image_file_arr = get_image_files(dir_name)
+image_file_arr = image_paths(dir_name)
 
 awal = 0
 akhir = len(image_file_arr)
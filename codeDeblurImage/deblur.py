@@ -0,0 +1,68 @@
+# In-process deblurring: estimate-kernel and deconv on NumPy arrays.
+# Same processing as
+#   codeDeblurImage/estimate-kernel 7 file kernel.tif --no-multiscale
+#   codeDeblurImage/deconv file kernel.tif result.png --alpha=9
+# but without starting two processes per image and without writing the
+# kernel to a .tif file and reading it back.
+#
+# Build the module first (needs the same libraries as estimate-kernel):
+#   cd codeDeblurImage && make deblur_native
+
+import numpy as np
+
+try:
+    import deblur_native
+except ImportError:
+    deblur_native = None
+
+# True when the module is built
+def available():
+    return deblur_native is not None
+
+def _as_float_image(img):
+    img = np.ascontiguousarray(img, dtype=np.float32)
+    if (img.ndim == 2):
+        img = img[:, :, None]
+    return img
+
+# Estimate the blur kernel of an image (values 0 - 255, gray or color).
+# Return the kernel, a ks x ks float32 array that sums to 1.
+# Options are the ones of ./estimate-kernel (multiscale=False is --no-multiscale,
+# init_kernel=k is --init-kernel, a warm start from a ks x ks kernel)
+def estimate_kernel(img, ks=7, multiscale=True, **opts):
+    img = _as_float_image(img)
+    h, w, d = img.shape
+    if (opts.get("init_kernel") is not None):
+        opts["init_kernel"] = np.ascontiguousarray(opts["init_kernel"], dtype=np.float32)
+    kernel, _, _, _ = deblur_native.estimate_kernel(img, w, h, d, ks, multiscale, **opts)
+    return np.frombuffer(kernel, dtype=np.float32).reshape(ks, ks)
+
+# Deblur an image with a known kernel (./deconv).
+# Return a float32 array with the shape of img, in the range of img
+def deconv(img, kernel, alpha=3000, beta=30, iterations=7):
+    shape = np.shape(img)
+    img = _as_float_image(img)
+    h, w, d = img.shape
+    kernel = np.ascontiguousarray(kernel, dtype=np.float32)
+    kh, kw = kernel.shape
+    hasil = deblur_native.deconv(img, w, h, d, kernel, kw, kh, alpha, beta, iterations)
+    return np.frombuffer(hasil, dtype=np.float32).reshape(shape)
+
+# Estimate the kernel and deblur with it, like commandW-update.py does
+# with its two commands. Return (kernel, uint8 image)
+def deblur_image(img, ks=7, alpha=9, multiscale=False):
+    kernel = estimate_kernel(img, ks, multiscale)
+    return kernel, to_uint8(deconv(img, kernel, alpha))
+
+# Result of deconv as uint8, rounded like iio does when deconv saves a PNG:
+# (uint8)(0.5 + x), clamped
+def to_uint8(img):
+    return np.clip(np.floor(img.astype(np.float64) + 0.5), 0, 255).astype(np.uint8)
+
+# FFTW wisdom for images of w x h in wisdom_dir (the same files as
+# ./estimate-kernel --wisdom=DIR). True if a file was loaded / written
+def load_wisdom(wisdom_dir, w, h):
+    return deblur_native.load_wisdom(wisdom_dir, w, h)
+
+def save_wisdom(wisdom_dir, w, h):
+    return deblur_native.save_wisdom(wisdom_dir, w, h)
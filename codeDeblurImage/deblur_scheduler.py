@@ -0,0 +1,203 @@
+# Run estimate-kernel + deconv for many images at once.
+# Every image is one job (estimate the kernel, then deblur with it) and up
+# to `workers` jobs run at the same time, so the kernel estimation of the
+# next image overlaps the deconvolution of the previous one. Each job can
+# be limited to a number of OpenMP threads and all running jobs together to
+# an estimated amount of memory. The output and the exit code of every
+# command are kept per job, so a failed image is reported instead of lost.
+# With a wisdom directory the FFTW plans are kept per image size between
+# runs, and warm_up=True deblurs the first image of every size alone before
+# the others, so parallel jobs do not all measure the same plans.
+
+import os
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from PIL import Image
+
+# i: number of the image (used in kernel-i.tif / result-i.png)
+DeblurJob = namedtuple("DeblurJob", ["i", "image_file", "kernel_file", "result_file"])
+
+StageResult = namedtuple("StageResult", ["name", "command", "returncode", "stdout", "stderr", "seconds"])
+
+# rough peak memory of estimate-kernel / deconv per pixel (float images and
+# complex FFT buffers), used for the memory limit
+BYTES_PER_PIXEL = 256
+
+class JobResult:
+    def __init__(self, job, stages, seconds):
+        self.job = job
+        self.stages = stages
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return len(self.stages) == 2 and all(s.returncode == 0 for s in self.stages)
+
+# Memory that the running jobs may use together (in bytes).
+# A job larger than the whole budget still runs, but alone.
+class MemoryBudget:
+    def __init__(self, total):
+        self.total = total
+        self.used = 0
+        self.cond = threading.Condition()
+
+    def acquire(self, n):
+        with self.cond:
+            while (self.used > 0 and self.used + n > self.total):
+                self.cond.wait()
+            self.used += n
+
+    def release(self, n):
+        with self.cond:
+            self.used -= n
+            self.cond.notify_all()
+
+def wisdom_args(wisdom_dir):
+    return ["--wisdom=" + wisdom_dir] if wisdom_dir else []
+
+# init_kernel: kernel file to start from (warm start), iterations: None = default
+def estimate_command(job, ks=7, multiscale=False, wisdom_dir=None, init_kernel=None, iterations=None):
+    com = ["codeDeblurImage/estimate-kernel", str(ks), job.image_file, job.kernel_file]
+    if (not multiscale):
+        com += ["--no-multiscale"]
+    if (init_kernel):
+        com += ["--init-kernel=" + init_kernel]
+    if (iterations):
+        com += ["--iterations=" + str(iterations)]
+    return com + wisdom_args(wisdom_dir)
+
+def deconv_command(job, alpha=9, wisdom_dir=None):
+    return ["codeDeblurImage/deconv", job.image_file, job.kernel_file, job.result_file,
+            "--alpha=" + str(alpha)] + wisdom_args(wisdom_dir)
+
+# (w, h, d) of an image, only the header is read. None if it can not be read
+def image_shape(path):
+    try:
+        with Image.open(path) as img:
+            return img.size + (len(img.getbands()),)
+    except OSError:
+        return None
+
+# Estimated memory of a job from the image size.
+# An unreadable file counts as 0, estimate-kernel will report the error.
+def job_memory(job):
+    shape = image_shape(job.image_file)
+    if (shape is None):
+        return 0
+    w, h, d = shape
+    return w * h * d * BYTES_PER_PIXEL
+
+# Split jobs into the first job of every image size (w, h) and the rest
+def first_of_each_size(jobs):
+    ukuran = set()
+    pertama = []
+    sisa = []
+    for job in jobs:
+        shape = image_shape(job.image_file)
+        if (shape is not None and shape[:2] not in ukuran):
+            ukuran.add(shape[:2])
+            pertama.append(job)
+        else:
+            sisa.append(job)
+    return pertama, sisa
+
+def run_stage(name, command):
+    time_start = time.perf_counter()
+    proses = subprocess.run(command, capture_output=True, text=True)
+    return StageResult(name, command, proses.returncode, proses.stdout, proses.stderr,
+                       time.perf_counter() - time_start)
+
+class DeblurScheduler:
+    # prefix: put in front of every command (["sudo"] like commandW-update.py)
+    # threads: OpenMP threads of one job (None = not limited)
+    # max_memory: bytes for all running jobs together (None = not limited)
+    # wisdom_dir: directory of the FFTW wisdom files (None = no wisdom)
+    def __init__(self, workers=2, threads=None, max_memory=None, prefix=("sudo",),
+                 ks=7, alpha=9, multiscale=False, log_dir=None, wisdom_dir=None):
+        self.workers = workers
+        self.prefix = list(prefix)
+        if (threads is not None):
+            # through env so that it also passes sudo
+            self.prefix += ["env", f"OMP_NUM_THREADS={threads}"]
+        self.budget = MemoryBudget(max_memory) if max_memory else None
+        self.ks = ks
+        self.alpha = alpha
+        self.multiscale = multiscale
+        self.log_dir = log_dir
+        self.wisdom_dir = wisdom_dir
+
+    def run_job(self, job):
+        time_start = time.perf_counter()
+        memory = job_memory(job) if self.budget else 0
+        if (self.budget):
+            self.budget.acquire(memory)
+        try:
+            stages = [run_stage("estimate", self.prefix + estimate_command(job, self.ks, self.multiscale,
+                                                                         self.wisdom_dir))]
+            # no deconv without a kernel
+            if (stages[0].returncode == 0):
+                stages.append(run_stage("deconv", self.prefix + deconv_command(job, self.alpha, self.wisdom_dir)))
+        finally:
+            if (self.budget):
+                self.budget.release(memory)
+        hasil = JobResult(job, stages, time.perf_counter() - time_start)
+        if (not hasil.ok and self.log_dir):
+            self.write_log(hasil)
+        return hasil
+
+    # Output of every command of a failed job: log_dir/<i>.log
+    def write_log(self, hasil):
+        os.makedirs(self.log_dir, exist_ok=True)
+        with open(os.path.join(self.log_dir, f"{hasil.job.i}.log"), "w") as f:
+            for s in hasil.stages:
+                f.write(f"$ {' '.join(s.command)}\n")
+                f.write(f"exit code {s.returncode}, {s.seconds:.2f} second\n")
+                f.write(f"--- stdout\n{s.stdout}\n--- stderr\n{s.stderr}\n\n")
+
+    # Run all jobs. on_done(result) is called in this thread for every job as
+    # it finishes (in any order). At most 2 * workers jobs are queued.
+    # warm_up: first run the first image of every size alone (needs wisdom_dir)
+    # Return (jobs done, jobs failed, seconds)
+    def run(self, jobs, on_done=None, report_every=10, warm_up=False):
+        time_start = time.perf_counter()
+        selesai = 0
+        gagal = 0
+        pending = set()
+
+        def finish(hasil):
+            nonlocal selesai, gagal
+            if (hasil.ok):
+                selesai += 1
+            else:
+                gagal += 1
+            if (on_done is not None):
+                on_done(hasil)
+            jumlah = selesai + gagal
+            if (report_every and jumlah % report_every == 0):
+                lama = time.perf_counter() - time_start
+                print(f"{jumlah} image(s), {jumlah / lama:.3f} image/second, {gagal} failed")
+
+        if (warm_up and self.wisdom_dir):
+            pertama, jobs = first_of_each_size(jobs)
+            for job in pertama:
+                finish(self.run_job(job))
+        jobs = iter(jobs)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                for job in jobs:
+                    pending.add(executor.submit(self.run_job, job))
+                    if (len(pending) >= 2 * self.workers):
+                        break
+                if (not pending):
+                    break
+
+                sudah, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in sudah:
+                    finish(f.result())
+
+        return selesai, gagal, time.perf_counter() - time_start
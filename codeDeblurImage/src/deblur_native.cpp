@@ -0,0 +1,217 @@
+// Python bindings of estimate-kernel and deconv, so that a batch driver can
+// deblur images in-process: no process start-up per image, no kernel .tif
+// written and read back, and the FFTW plans cached by fft.hpp are kept
+// between images of the same size.
+//
+// Build with:  make deblur_native
+// The Python side (deblur.py) passes float32 buffers of h * w * d samples,
+// interleaved like img_t, and gets float32 buffers back.
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include <mutex>
+#include <stdexcept>
+
+#include "estimate_kernel.hpp"
+#include "deconv.hpp"
+#include "wisdom.hpp"
+
+// the plan cache of fft.hpp and the tvreg solver are not thread-safe,
+// so one computation runs at a time (other Python threads keep running)
+static std::mutex deblur_mutex;
+
+static bool check_size(const Py_buffer& buf, Py_ssize_t n, const char* name)
+{
+    if (buf.len != n * (Py_ssize_t) sizeof(float)) {
+        PyErr_Format(PyExc_ValueError, "%s must hold %zd float32 samples", name, n);
+        return false;
+    }
+    return true;
+}
+
+static PyObject* to_bytes(const img_t<float>& img)
+{
+    return PyBytes_FromStringAndSize(reinterpret_cast<const char*>(&img[0]),
+                                     img.size * sizeof(float));
+}
+
+// estimate_kernel(image, w, h, d, ks, multiscale=True, lambda_=4e-3, ..., init_kernel=None)
+//   -> (kernel bytes (ks * ks float32), sharp image bytes (cropped), sharp w, sharp h)
+// same defaults as ./estimate-kernel, init_kernel is --init-kernel (ks * ks float32)
+static PyObject* estimate_kernel(PyObject*, PyObject* args, PyObject* kwargs)
+{
+    static const char* keywords[] = {"image", "w", "h", "d", "ks", "multiscale",
+                                     "lambda_", "lambda_ratio", "lambda_min", "gamma",
+                                     "iterations", "scalefactor", "kernel_threshold_max",
+                                     "remove_isolated", "init_kernel", NULL};
+    Py_buffer image;
+    Py_buffer init_kernel = {NULL, NULL};
+    int w, h, d;
+    options opts;
+    int multiscale = 1;
+    int remove_isolated = 1;
+    opts.verbose = false;
+    opts.lambda = 4e-3f;
+    opts.lambda_ratio = 1/1.1f;
+    opts.lambda_min = 1e-4f;
+    opts.gamma = 20.f;
+    opts.iterations = 5;
+    opts.scalefactor = 0.5f;
+    opts.kernel_threshold_max = 0.05f;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "y*iiii|pffffiffpz*", const_cast<char**>(keywords),
+                                     &image, &w, &h, &d, &opts.ks, &multiscale,
+                                     &opts.lambda, &opts.lambda_ratio, &opts.lambda_min, &opts.gamma,
+                                     &opts.iterations, &opts.scalefactor, &opts.kernel_threshold_max,
+                                     &remove_isolated, &init_kernel))
+        return NULL;
+    opts.multiscale = multiscale;
+    opts.remove_isolated = remove_isolated;
+
+    bool ok = w > 0 && h > 0 && d > 0 && opts.ks >= 1 && opts.ks % 2 == 1;
+    if (!ok)
+        PyErr_SetString(PyExc_ValueError, "w, h, d must be positive and ks odd");
+    ok = ok && check_size(image, (Py_ssize_t) w * h * d, "image");
+    bool warm = init_kernel.buf != NULL;
+    if (ok && warm && opts.multiscale) {
+        PyErr_SetString(PyExc_ValueError, "init_kernel needs multiscale=False");
+        ok = false;
+    }
+    ok = ok && (!warm || check_size(init_kernel, (Py_ssize_t) opts.ks * opts.ks, "init_kernel"));
+    if (!ok) {
+        PyBuffer_Release(&image);
+        if (warm)
+            PyBuffer_Release(&init_kernel);
+        return NULL;
+    }
+
+    img_t<float> v(w, h, d, static_cast<float*>(image.buf));
+    PyBuffer_Release(&image);
+    img_t<float> initk;
+    if (warm) {
+        initk = img_t<float>(opts.ks, opts.ks, 1, static_cast<float*>(init_kernel.buf));
+        PyBuffer_Release(&init_kernel);
+    }
+
+    img_t<float> k, u;
+    std::string error;
+    Py_BEGIN_ALLOW_THREADS
+    try {
+        std::lock_guard<std::mutex> lock(deblur_mutex);
+        preprocess_image(v, v, opts);
+        if (opts.multiscale) {
+            multiscale_l0_kernel_estimation(k, u, v, opts);
+        } else {
+            l0_kernel_estimation(k, u, v, v, opts, warm ? &initk : nullptr);
+        }
+    } catch (const std::exception& e) {
+        error = e.what();
+    }
+    Py_END_ALLOW_THREADS
+
+    if (!error.empty()) {
+        PyErr_SetString(PyExc_RuntimeError, error.c_str());
+        return NULL;
+    }
+    return Py_BuildValue("(NNii)", to_bytes(k), to_bytes(u), u.w, u.h);
+}
+
+// deconv(image, w, h, d, kernel, kw, kh, alpha=3000, beta=30, iterations=7)
+//   -> deblurred image bytes (w * h * d float32)
+// same defaults as ./deconv
+static PyObject* deconv(PyObject*, PyObject* args, PyObject* kwargs)
+{
+    static const char* keywords[] = {"image", "w", "h", "d", "kernel", "kw", "kh",
+                                     "alpha", "beta", "iterations", NULL};
+    Py_buffer image, kernel;
+    int w, h, d, kw, kh;
+    float alpha = 3000.f;
+    float beta = 30.f;
+    int iterations = 7;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "y*iiiy*ii|ffi", const_cast<char**>(keywords),
+                                     &image, &w, &h, &d, &kernel, &kw, &kh,
+                                     &alpha, &beta, &iterations))
+        return NULL;
+
+    bool ok = w > 0 && h > 0 && d > 0 && kw > 0 && kh > 0;
+    if (!ok)
+        PyErr_SetString(PyExc_ValueError, "image and kernel sizes must be positive");
+    ok = ok && check_size(image, (Py_ssize_t) w * h * d, "image")
+            && check_size(kernel, (Py_ssize_t) kw * kh, "kernel");
+    if (!ok) {
+        PyBuffer_Release(&image);
+        PyBuffer_Release(&kernel);
+        return NULL;
+    }
+
+    img_t<float> img(w, h, d, static_cast<float*>(image.buf));
+    img_t<float> K(kw, kh, 1, static_cast<float*>(kernel.buf));
+    PyBuffer_Release(&image);
+    PyBuffer_Release(&kernel);
+
+    img_t<float> result;
+    std::string error;
+    Py_BEGIN_ALLOW_THREADS
+    try {
+        std::lock_guard<std::mutex> lock(deblur_mutex);
+        deconv_image(result, img, K, iterations, alpha, beta);
+    } catch (const std::exception& e) {
+        error = e.what();
+    }
+    Py_END_ALLOW_THREADS
+
+    if (!error.empty()) {
+        PyErr_SetString(PyExc_RuntimeError, error.c_str());
+        return NULL;
+    }
+    return to_bytes(result);
+}
+
+// load_wisdom(dir, w, h) -> True if a wisdom file for this size was imported
+// save_wisdom(dir, w, h) -> True if the wisdom of this process was written
+// (the files of ./estimate-kernel --wisdom=DIR and ./deconv --wisdom=DIR)
+static PyObject* wisdom_call(PyObject* args, bool (*f)(const std::string&, int, int))
+{
+    const char* dir;
+    int w, h;
+    if (!PyArg_ParseTuple(args, "sii", &dir, &w, &h))
+        return NULL;
+    bool ok;
+    Py_BEGIN_ALLOW_THREADS
+    std::lock_guard<std::mutex> lock(deblur_mutex);
+    ok = f(dir, w, h);
+    Py_END_ALLOW_THREADS
+    return PyBool_FromLong(ok);
+}
+
+static PyObject* load_wisdom(PyObject*, PyObject* args)
+{
+    return wisdom_call(args, wisdom::load);
+}
+
+static PyObject* save_wisdom(PyObject*, PyObject* args)
+{
+    return wisdom_call(args, wisdom::save);
+}
+
+static PyMethodDef deblur_native_methods[] = {
+    {"estimate_kernel", (PyCFunction)(void(*)(void)) estimate_kernel, METH_VARARGS | METH_KEYWORDS,
+     "estimate_kernel(image, w, h, d, ks, multiscale=True, ..., init_kernel=None) -> (kernel, sharp, sharp_w, sharp_h)"},
+    {"deconv", (PyCFunction)(void(*)(void)) deconv, METH_VARARGS | METH_KEYWORDS,
+     "deconv(image, w, h, d, kernel, kw, kh, alpha=3000, beta=30, iterations=7) -> deblurred"},
+    {"load_wisdom", load_wisdom, METH_VARARGS, "load_wisdom(dir, w, h) -> bool"},
+    {"save_wisdom", save_wisdom, METH_VARARGS, "save_wisdom(dir, w, h) -> bool"},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef deblur_native_module = {
+    PyModuleDef_HEAD_INIT, "deblur_native", "In-process estimate-kernel and deconv", -1,
+    deblur_native_methods, NULL, NULL, NULL, NULL
+};
+
+PyMODINIT_FUNC PyInit_deblur_native(void)
+{
+    return PyModule_Create(&deblur_native_module);
+}
@@ -2,6 +2,7 @@
 #include <random>
 
 #include "estimate_kernel.hpp"
+#include "wisdom.hpp"
 
 #include "args.hxx"
 #include <iostream>
@@ -25,6 +26,8 @@ static options parse_args(int argc, char** argv)
     args::ValueFlag<std::string> outputsharp(parser, "output-sharp", "output the sharp image to file", {"output-sharp"});
     args::ValueFlag<std::string> debug(parser, "debug", "output all kernels, sharp and blurry images", {"debug"});
     args::Flag verbose(parser, "verbose", "output more information", {"verbose"});
+    args::ValueFlag<std::string> initkernel(parser, "init-kernel", "start from this kernel (warm start, needs --no-multiscale)", {"init-kernel"});
+    args::ValueFlag<std::string> wisdom(parser, "wisdom", "directory of the FFTW wisdom files (one per image size)", {"wisdom"});
 
     try {
         parser.ParseCLI(argc, argv);
@@ -57,6 +60,8 @@ static options parse_args(int argc, char** argv)
     opts.outputsharp = args::get(outputsharp);
     opts.verbose = args::get(verbose);
     opts.debug = args::get(debug);
+    opts.wisdom = args::get(wisdom);
+    opts.initkernel = args::get(initkernel);
     return opts;
 }
 
@@ -64,20 +69,34 @@ int main(int argc, char** argv) {
     struct options opts = parse_args(argc, argv);
 
     img_t<float> v = img_t<float>::load(opts.input);
+    int w = v.w, h = v.h;
+    wisdom::load(opts.wisdom, w, h);
 
     preprocess_image(v, v, opts);
 
+    img_t<float> initk;
+    if (!opts.initkernel.empty()) {
+        initk = img_t<float>::load(opts.initkernel);
+        if (opts.multiscale || initk.w != opts.ks || initk.h != opts.ks || initk.d != 1) {
+            std::cerr << "--init-kernel needs --no-multiscale and a " << opts.ks << "x" << opts.ks
+                      << " kernel" << std::endl;
+            return 1;
+        }
+    }
+
     img_t<float> k;
     img_t<float> u;
     if (opts.multiscale) {
         multiscale_l0_kernel_estimation(k, u, v, opts);
     } else {
-        l0_kernel_estimation(k, u, v, v, opts);
+        l0_kernel_estimation(k, u, v, v, opts, initk.size ? &initk : nullptr);
     }
 
     k.save(opts.output);
     if (!opts.outputsharp.empty()) {
         u.save(opts.outputsharp);
     }
+
+    wisdom::save(opts.wisdom, w, h);
 }
 
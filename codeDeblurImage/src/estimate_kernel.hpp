@@ -10,6 +10,8 @@ struct options {
     bool verbose;
     std::string debug;
     std::string outputsharp;
+    std::string wisdom;
+    std::string initkernel;
 
     int ks;
     std::string input;
@@ -207,13 +209,19 @@ private:
 
 // implements the inner loop of Algorithm 1
 // estimates the sharp image and the kernel from a blurry image and an initialization of u
+// if initk is given (warm start, e.g. the kernel of the previous video frame),
+// u is first estimated with initk instead of starting from the blurry image
 template <typename T>
 void l0_kernel_estimation(img_t<T>& k, img_t<T>& u, const img_t<T>& v,
-                          const img_t<T>& initu, struct options& opts) {
+                          const img_t<T>& initu, struct options& opts,
+                          const img_t<T>* initk = nullptr) {
     L0ImagePredictor<T> sharp_predictor(v);
     FourierKernelEstimator<T> kernel_estimator(v, opts.ks);
 
     u = initu;
+    if (initk) {
+        sharp_predictor(u, *initk, opts.lambda, 2*opts.lambda, T(2), T(1e5));
+    }
 
     // make sure lambda is not lower than lambda_min
     // in case the user changed lambda_min but not lambda
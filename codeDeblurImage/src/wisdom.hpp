@@ -0,0 +1,48 @@
+#pragma once
+
+// Persistent FFTW wisdom (like imscript/fftwisdom.c, but one file per image
+// size and thread count, in a directory given with --wisdom=DIR).
+// fft.hpp plans with FFTW_MEASURE; with the wisdom of a previous run of the
+// same size the plans are made without measuring again.
+
+#include <cstdio>
+#include <string>
+#include <unistd.h>
+
+#include <fftw3.h>
+
+#include "image.hpp"
+
+namespace wisdom {
+
+    inline std::string filename(const std::string& dir, int w, int h) {
+        int threads = 1;
+#ifdef _OPENMP
+        threads = omp_get_max_threads();
+#endif
+        return string_format("%s/wisdom-%dx%d-t%d.fftwf", dir.c_str(), w, h, threads);
+    }
+
+    /// import the wisdom for this image size, if there is one
+    inline bool load(const std::string& dir, int w, int h) {
+        if (dir.empty())
+            return false;
+        return fftwf_import_wisdom_from_filename(filename(dir, w, h).c_str());
+    }
+
+    /// export all the wisdom of this process for this image size.
+    /// Written to a temporary file and renamed, so that jobs running at the
+    /// same time never read a half-written file.
+    inline bool save(const std::string& dir, int w, int h) {
+        if (dir.empty())
+            return false;
+        std::string name = filename(dir, w, h);
+        std::string tmp = string_format("%s.%d.tmp", name.c_str(), (int) getpid());
+        if (!fftwf_export_wisdom_to_filename(tmp.c_str())) {
+            std::remove(tmp.c_str());
+            return false;
+        }
+        return std::rename(tmp.c_str(), name.c_str()) == 0;
+    }
+
+}
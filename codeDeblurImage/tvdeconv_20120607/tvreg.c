@@ -321,7 +321,8 @@ Catch:
         FFT(destroy_plan)(S.TransformB);
         FFT(destroy_plan)(S.InvTransformA);
         FFT(destroy_plan)(S.TransformA);
-        FFT(cleanup)();
+        /* No FFT(cleanup)() here: it would also forget the wisdom and
+           the cached plans of the caller (src/fft.hpp, deconv --wisdom). */
     }
 #endif    
     return Success;
@@ -0,0 +1,98 @@
+# Kernel reuse for the frames of a video (<video>_frames/frame_N.jpg made
+# by codePython/ekstrakImage.py). Consecutive frames of one clip usually have
+# nearly the same motion blur, so the kernel is only estimated on key frames
+# and reused for the frames in between. A key frame is:
+#  - the first frame of a clip, then every `every_n` frames,
+#  - a frame that looks very different from the previous one (a cut),
+#  - a frame whose blur drifted away from the one of the last key frame.
+# The drift is measured on the blurry frame itself: the share of the gradient
+# energy in 4 directions changes when the motion blur changes direction or
+# length, whatever the content. (The residual energy of the deblurred frame
+# hardly changes with a wrong kernel, the TV deconvolution fits any kernel.)
+# Inside a clip the estimation starts from the previous kernel (warm start).
+
+import os
+import re
+
+import cv2
+import numpy as np
+
+# "frame_12.jpg" -> 12, None if the name does not end with a number
+def frame_number(path):
+    angka = re.search(r"(\d+)$", os.path.splitext(os.path.basename(path))[0])
+    return int(angka.group(1)) if angka else None
+
+# Sort key: clip folder, then frame number (frame_2 before frame_10)
+def frame_order(path):
+    nomor = frame_number(path)
+    return (os.path.dirname(path), nomor is None, nomor or 0, os.path.basename(path))
+
+def to_gray(img):
+    if (img.ndim == 3):
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return img.astype(np.float32)
+
+# Share of the gradient energy in the directions 0, 90, 45 and 135 degrees.
+# A motion blur removes the gradients along its direction.
+def blur_direction(gray):
+    g = [gray[:, 1:] - gray[:, :-1], gray[1:, :] - gray[:-1, :],
+         gray[1:, 1:] - gray[:-1, :-1], gray[1:, :-1] - gray[:-1, 1:]]
+    energi = np.array([np.mean(d * d) for d in g])
+    return energi / max(energi.sum(), 1e-12)
+
+class KernelReuse:
+    # every_n: estimate at least every n frames (1 = every frame)
+    # drift: difference of blur_direction (sum of absolute differences, 0 - 2)
+    #        to the last key frame that needs a new kernel
+    # cut_threshold: mean gray difference (0 - 255) of two frames that counts as a cut
+    def __init__(self, every_n=10, drift=0.1, cut_threshold=30, thumb_size=64):
+        self.every_n = every_n
+        self.drift = drift
+        self.cut_threshold = cut_threshold
+        self.thumb_size = thumb_size
+
+        self.clip = None
+        self.thumb = None
+        self.direction = None
+        self.kernel = None
+        self.key_direction = None
+        self.since = 0
+        # True if self.kernel may be the warm start of the next estimation
+        self.warm = False
+        # why the last frame needs a new kernel (for the output)
+        self.alasan = ""
+
+    # True if the kernel of this frame has to be estimated,
+    # False if self.kernel can be used
+    def need_estimate(self, path, img):
+        gray = to_gray(img)
+        clip = os.path.dirname(path)
+        thumb = cv2.resize(gray, (self.thumb_size, self.thumb_size), interpolation=cv2.INTER_AREA)
+        cut = (self.thumb is not None and
+               float(np.mean(np.abs(thumb - self.thumb))) > self.cut_threshold)
+        self.thumb = thumb
+        self.direction = blur_direction(gray)
+
+        if (clip != self.clip or cut):
+            self.alasan = "klip baru" if clip != self.clip else "pergantian adegan"
+            self.clip = clip
+            self.kernel = None
+        self.warm = self.kernel is not None
+
+        if (self.kernel is None):
+            return True
+        if (self.since >= self.every_n):
+            self.alasan = f"setiap {self.every_n} frame"
+            return True
+        beda = float(np.sum(np.abs(self.direction - self.key_direction)))
+        if (beda > self.drift):
+            self.alasan = f"blur berubah ({beda:.3f})"
+            return True
+        self.since += 1
+        return False
+
+    # The kernel was estimated on the last frame
+    def estimated(self, kernel):
+        self.kernel = kernel
+        self.key_direction = self.direction
+        self.since = 1
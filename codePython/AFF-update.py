@@ -1,24 +1,31 @@
 # referensi: https://www.geeksforgeeks.org/python-opencv-getting-and-setting-pixels/
 
 import numpy as np
+import argparse
 import cv2
+import functools
 import math
 import os
 from PIL import Image
 import time
-import pandas as pd
-import openpyxl
+from concurrent.futures import ProcessPoolExecutor
+
+from aff_filter import aff_denoise, aff_denoise_shared
+from file_index import image_paths
+from fuzzy_table import GK, MEAN_FS, fuzzy_mean, gk, mean_fs
+from image_pipeline import ImagePipeline
+from manifest import Manifest, manifest_path
+from neighbourhood import get_neighbours
+from noise_detector import detect_noise
+from result_log import ResultLog, build_excel
+from shared_image import create_shared, release_shared, share_array
+from stage_timer import StageLog, profile_call, timed
 
 # Get sum noise after process
+# (cek_noise3 with threshold 20 on every sample, see noise_detector.py)
 def get_sum_noise(img, h, w, c):
-    count = 0
-    for x in range(h):
-        for y in range(w):
-            for cc in range(c):
-                mask = get_mask2(img, x, y, cc)
-                if(cek_noise3(mask, 20)):
-                    count = count + 1
-    return count
+    noise, _ = detect_noise(get_neighbours(img), 20)
+    return int(noise.sum())
 
 # Get the name of time
 def name_of_time(tm):
@@ -29,21 +36,12 @@ def name_of_time(tm):
         tmp = tm % 60
         if(i >= len(waktu)):
             break
-        hasil = f" {int(round(tmp))} {waktu[i]}" + hasil
+        # the seconds keep 2 decimals (a small image takes less than 1 second)
+        hasil = (f" {tmp:.2f} {waktu[i]}" if i == 0 else f" {int(tmp)} {waktu[i]}") + hasil
         i += 1
         tm = tm // 60
     return hasil
 
-# function to get all image in directory
-def get_image_files(directory):
-    image_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff')
-    image_files = []
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.lower().endswith(image_extensions):
-                image_files.append(os.path.join(root, file))
-    return image_files
-
 # Function to check noise in image
 # threshold = 2.0
 def cek_noise2(mask, threshold):
@@ -93,16 +91,9 @@ def cek_noise(mask):
     return abs(math.floor(rata) - Xp) >= 30
 
 # function to get mask of pixel
-def get_mask2(img, x, y, c):
-    padded_image = cv2.copyMakeBorder(img, 1, 1, 1, 1, cv2.BORDER_REPLICATE)
-    
-    mask = []
-    for i in range(x, x + 3):
-        tmp = []
-        for j in range(y, y + 3):
-            tmp = tmp + [padded_image[i, j, c]]
-        mask = mask + [tmp]
-    return mask
+# windows = neighbourhood.get_windows(img), padded once per image
+def get_mask2(windows, x, y, c):
+    return windows[x, y, c]
 
 def get_mask(img, x, y, c, h, w):
     # x = h = height
@@ -155,86 +146,18 @@ def get_mean2(arr):
                 hsl = hsl + arr[i][j]
     return hsl / 8
 
+# meanFS and Gk are lookups in the tables of fuzzy_table.py
 def meanFS(n):
-    a = 0
-    b = 3
-    c = 252
-    d = 255
-
-    if (n > a and n < b):
-        return (n - a) / 3
-    elif (n >= b and n <= c):
-        return 1
-    elif (n > c and n < d):
-        return (d - n) / 3
-    else:
-        return 0;
+    return mean_fs(n)
 
 def mX(arr):
-    Trap = 0
-    m_X = arr[1][1]
-    ttl1 = 0
-    ttl2 = 0
-
-    for i in range(3):
-        for j in range(3):
-            Trap = meanFS(arr[i][j])
-            ttl1 = ttl1 + arr[i][j] * Trap
-            ttl2 = ttl2 + Trap
-    
-    if(ttl2 > 0):
-        m_X = ttl1 / ttl2
-    return m_X
+    return float(fuzzy_mean(np.ravel(arr), MEAN_FS))
 
 def Gk(x, k):
-    if (k == 0):
-        if (x <= 14):
-            return 1
-        elif (x > 14 and x < 17):
-            return (17 - x) / 3
-        else:
-            return 0
-    elif (k == 15):
-        if (x >= 241):
-            return 1
-        elif (x > 238 and x < 241):
-            return (241 - x) / 3
-        else:
-            return 0
-    else:
-        a = k * 16 - 2
-        b = k * 16 + 1
-        c = (k + 1) * 16 - 2
-        d = (k + 1) * 16 + 1
-
-        if (x > a and x < b):
-            return (x - a) / 3
-        elif (x >= b and x <= c):
-            return 1
-        elif (x > c and x < d):
-            return (d - x) / 3
-        else:
-            return 0
+    return gk(x, k)
 
 def mKX(arr):
-    Xp = arr[1][1]
-    m_KX = [0] * 16
-
-    for k in range(16):
-        m_KX[k] = Xp
-        ttl1 = 0
-        ttl2 = 0
-        g_k = 0
-
-        for i in range(3):
-            for j in range(3):
-                g_k = Gk(arr[i][j], k)
-                ttl1 = ttl1 + arr[i][j] * g_k
-                ttl2 = ttl2 + g_k
-        
-        if(ttl2 > 0):
-            m_KX[k] = ttl1 / ttl2
-    return m_KX
+    return list(fuzzy_mean(np.ravel(arr), GK))
 
 def Af(m_x, m_k_x):
     min_k = abs(m_x - m_k_x[0])
@@ -248,151 +171,250 @@ def Af(m_x, m_k_x):
     
     return m_k_x[ind]
 
-# declare variable name for excel
-data = {}
-
-# using pandas to create dataframe
-df = pd.DataFrame(data)
-
-### Ubah bagian ini disesuaikan dengan lokasi folder gambar berada
-#Contoh: img_loc = "D:\\OneDrive - mikroskil.ac.id\\(1) PDP\\2324Genap\\DatasetProcess\\Deblurring\\Apri"
-#img_loc = "D:\\HasilDebluring\\Process\\Apri"
-#img_loc = "D:\\OneDrive - mikroskil.ac.id\\(1) PDP\\2324Genap\\DatasetBaru1\\test\\images"
-img_loc = "/home/apriyanto/Documents/Baru-Lagi/citra_uji"
-
-### Ubah bagian ini disesuaikan dengan lokasi folder tempat gambar disimpan
-#Contoh: save_fol_loc
-#save_fol_loc = "D:\\OneDrive - mikroskil.ac.id\\(1) PDP\\2324Genap\\DatasetBaru1\\test-hasil"
-save_fol_loc = "/home/apriyanto/Documents/Baru-Lagi/citra_hasil"
-
-# Get all image in folder
-img_file = get_image_files(img_loc)
-
-### Ini disesuaikan kembali mau mulai dari gambar ke berapa sampai ke berapa
-mulai = 0
-akhir = len(img_file)
-
-# declare variabel in array to save in dataframe
-name_of_image = []
-sum_of_pixel = []
-total_of_noise = []
-percent_of_noise = []
-process_of_time = []
-
-total_of_noise_after = []
-percent_of_noise_after = []
-
-j = 0
-for i in range(mulai, akhir):
+# Save an image like cv2.imwrite, timing the encoding and the writing apart
+def write_image(path, img, times=None):
+    with timed(times, "encode"):
+        ok, data = cv2.imencode(os.path.splitext(path)[1], img)
+    if (not ok):
+        return False
+    with timed(times, "write"):
+        try:
+            with open(path, "wb") as f:
+                f.write(data.tobytes())
+        except OSError:
+            return False
+    return True
+
+# Denoise one decoded image (whole-image version of get_mask2, cek_noise3,
+# mKX, mX and Af). threads > 1: the image is cut into row bands filtered in
+# parallel; with executor the bands go to its worker processes through
+# shared memory instead. Return (filtered image, small record of the image)
+# name: the name of the image in the results (path relative to img_loc)
+def filter_image(img, name, threshold, threads=1, executor=None, waktu=None):
     # to count the time start of the process
-    time_start = time.time()
-
-    # name for file to save and location
-    name_of_image += [os.path.basename(img_file[i])]
-
-    #Ubuntu
-    ress = save_fol_loc + "/" + name_of_image[j]
-
-    #Windows
-    #ress = save_fol_loc + "\\" + name_of_image[j]
-
-    img = cv2.imread(img_file[i])
-    
-    # get the detail of image and print
-    print(f"Proses Citra ke-{i} = {name_of_image[j]}")
-    #print(f"Bentuk citra: {img.shape[0]} x {img.shape[1]} x {img.shape[2]} => ", end = "")
-    
-    ## get the image detail [ height, width, channel ]
-    hh = img.shape[0]
-    ww = img.shape[1]
-    cc = img.shape[2]
-
-    # get the total of pixel image
-    sum_pixel = ww * hh * cc
-    sum_of_pixel += [sum_pixel]
-    # print(f"Sum of pixel = {sum_of_pixel}")
-    
-    ## Declare Variabel
-    hsl_img = img[:]
-    mask = []
-    rata = 0
-    rata2 = 0
-    m_X = 0
-    m_k_x = [0] * 16
-    A_f = 0
-
-    # for count the noise
-    count = 0
-
-    # Processing Image
-    for x in range(hh):
-        for y in range(ww):
-            hsl = [0, 0, 0]
-            
-            for c in range(cc):
-                ## Get Masking from the Image
-                #mask = get_mask(img, x, y, c, hh, ww)
-                mask = get_mask2(img, x, y, c)
-
-                # Check noise with threshold 20
-                threshold = 20
-                if(not(cek_noise3(mask, threshold))):
-                    hsl[c] = mask[1][1]
-                    continue
-
-                #count the total of noise in image
-                count = count + 1
-                
-                rata = get_mean(mask)
-                rata2 = get_mean2(mask)
-                m_k_x = mKX(mask)
-
-                Xp = img[x, y, c]
-                m_X = mX(mask)
-                A_f = Af(m_X, m_k_x)
-
-                hsl[c] = Xp
-                if(math.floor(abs(rata2 - Xp)) >= 250):
-                    hsl[c] = int(math.floor(rata2))
-                elif(math.floor(abs(rata - m_X)) < 128):
-                    hsl[c] = int(math.floor(m_X))
-                else:
-                    hsl[c] = int(math.floor(A_f))
-            hsl_img[x, y] = [hsl[0], hsl[1], hsl[2]]
-
-    # get the time for end of process
-    end_time = time.time()
-    length_process = end_time - time_start
-
-    print(f"Sum of noise = {count} of {sum_pixel} = {count / float(sum_pixel) * 100}%")
-    print(f"Waktu untuk Proses = {name_of_time(length_process)}\n")
-
-    #total_of_noise += [count]
-    
-    #percent_of_noise += [f"{round(count / float(sum_of_pixel[j]) * 100, 3)}%"]
-    #process_of_time += [name_of_time(length_process)]
-    #print(f" = {process_of_time[j]}")
-
-    #tmp_count = get_sum_noise(hsl_img, ww, hh, cc)
-
-    #total_of_noise_after += [tmp_count]
-    #percent_of_noise_after += [f"{round(tmp_count / float(sum_of_pixel[j]) * 100, 3)}%"]
-    cv2.imwrite(ress, hsl_img)
+    time_start = time.perf_counter()
+    waktu = {} if waktu is None else waktu
 
-    '''
-    # insert data into data frame
-    df['image_name'] = name_of_image # get all image name
-    df['total_pixel_image'] = sum_of_pixel # get all total of pixel
-    df['total_noise'] = total_of_noise # get all total noise
-    df['percent_noise'] = percent_of_noise # convert all total of noise into percent with 3 decimal place
-    df['process_time'] = process_of_time # get all the time of process image
+    tahap = {}
+    if (executor is not None):
+        hsl_img, count = filter_image_shared(img, threshold, executor, tahap, waktu)
+    else:
+        hsl_img, count = aff_denoise(img, threshold, workers=threads, stats=tahap, times=waktu)
+
+    return hsl_img, {
+        "name": name,
+        "pixels": img.size,
+        "noise": count,
+        "stages": tahap,
+        "times": waktu,
+        "time": time.perf_counter() - time_start + waktu.get("decode", 0.0),
+    }
+
+# The image is copied once into shared memory and the workers filter its
+# row bands straight into a shared output block (only descriptors are sent).
+# Return (private copy of the result, number of noisy samples)
+def filter_image_shared(img, threshold, executor, tahap, waktu):
+    with timed(waktu, "share"):
+        shm_img, img_shared, img_desc = share_array(img)
+        shm_hsl, hsl_img, hsl_desc = create_shared(img.shape, np.uint8)
+
+    try:
+        count = aff_denoise_shared(img_desc, hsl_desc, executor, threshold, stats=tahap, times=waktu)
+        # the result is saved after the shared blocks are released
+        hasil = hsl_img.copy()
+    finally:
+        del img_shared, hsl_img
+        release_shared(shm_img, unlink=True)
+        release_shared(shm_hsl, unlink=True)
+    return hasil, count
+
+# Save the result of filter_image, its encode / write time is added to the record
+# and stats["ok"] says if the file was written
+def save_result(ress, hsl_img, stats):
+    time_start = time.perf_counter()
+    ok = write_image(ress, hsl_img, stats["times"])
+    stats["time"] += time.perf_counter() - time_start
+    stats["ok"] = ok
+    return ok
+
+# Denoise one image file and save the result.
+# Runs in the worker processes too, so it only sends back a small record
+# (with "times", the seconds of every stage, see stage_timer.py).
+def process_image(img_path, ress, threshold, threads=1, name=None):
+    waktu = {}
+    with timed(waktu, "decode"):
+        img = cv2.imread(img_path)
+
+    name = name if name is not None else os.path.basename(img_path)
+    hsl_img, stats = filter_image(img, name, threshold, threads, waktu=waktu)
+    save_result(ress, hsl_img, stats)
+    return stats
+
+# Columns of result-1.xlsx
+KOLOM = ["image_name", "total_pixel_image", "total_noise", "percent_noise", "process_time"]
+#KOLOM += ["total_noise_after", "percent_noise_after"] (get_sum_noise of the result)
+
+# One row of result-1.xlsx (seconds = None if not known)
+def result_row(name, sum_pixel, count, seconds):
+    return {
+        "image_name": name, # image name
+        "total_pixel_image": sum_pixel, # total of pixel
+        "total_noise": count, # total noise
+        "percent_noise": f"{round(count / float(sum_pixel) * 100, 3)}%", # total of noise in percent with 3 decimal place
+        "process_time": name_of_time(seconds) if seconds is not None else "", # the time of process image
+    }
+
+if __name__ == "__main__":
+    # Number of worker processes (1 = process the images one by one)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1)
+    # Number of threads for one image (for very large images)
+    parser.add_argument("--threads", type=int, default=1)
+    # Share every image with all workers (shared memory) instead of one image per worker
+    parser.add_argument("--shared", action="store_true")
+    # Process every image again, even if the manifest says it is done
+    parser.add_argument("--no-resume", action="store_true")
+    # One row per image is written to this file (chunk-size rows at a time),
+    # result-1.xlsx is built from it at the end (default: result-1.csv in save_fol_loc)
+    parser.add_argument("--results", default=None)
+    parser.add_argument("--chunk-size", type=int, default=100)
+    parser.add_argument("--no-excel", action="store_true")
+    # One JSON line per image with the seconds of every stage (decode, pad,
+    # detect, fuzzy, propagate, encode, write), the table is printed at the end anyway
+    parser.add_argument("--timings", default=None)
+    # Run the first image under cProfile and tracemalloc (in this process),
+    # the profile is saved in this file
+    parser.add_argument("--profile", nargs="?", const="profile.pstats", default=None)
+    # Without --workers (or with --shared): decode the next --prefetch images in a
+    # thread while one is filtered, and encode / save the results in --writers
+    # threads behind it (0 = one step after the other)
+    parser.add_argument("--prefetch", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    args = parser.parse_args()
+
+    ### Ubah bagian ini disesuaikan dengan lokasi folder gambar berada
+    #Contoh: img_loc = "D:\\OneDrive - mikroskil.ac.id\\(1) PDP\\2324Genap\\DatasetProcess\\Deblurring\\Apri"
+    #img_loc = "D:\\HasilDebluring\\Process\\Apri"
+    #img_loc = "D:\\OneDrive - mikroskil.ac.id\\(1) PDP\\2324Genap\\DatasetBaru1\\test\\images"
+    img_loc = "/home/apriyanto/Documents/Baru-Lagi/citra_uji"
+
+    ### Ubah bagian ini disesuaikan dengan lokasi folder tempat gambar disimpan
+    #Contoh: save_fol_loc
+    #save_fol_loc = "D:\\OneDrive - mikroskil.ac.id\\(1) PDP\\2324Genap\\DatasetBaru1\\test-hasil"
+    save_fol_loc = "/home/apriyanto/Documents/Baru-Lagi/citra_hasil"
+
+    # Get all image in folder
+    img_file = image_paths(img_loc)
+
+    ### Ini disesuaikan kembali mau mulai dari gambar ke berapa sampai ke berapa
+    mulai = 0
+    akhir = len(img_file)
+
+    # Check noise with threshold 20
+    threshold = 20
+
+    # name of every image: its path relative to img_loc ("/" separated, the
+    # file name when there are no subfolders). The result keeps the same
+    # subfolders, so Pengujian.py pairs sub/x.jpg with its result sub/x.jpg
+    nama = [os.path.relpath(img_file[i], img_loc).replace(os.sep, "/") for i in range(mulai, akhir)]
 
-    df['total_noise_after'] = total_of_noise_after # get all the time of process image
-    df['percent_noise_after'] = percent_of_noise_after # get all the time of process image
+    # name for file to save and location
+    ress = [os.path.join(save_fol_loc, *n.split("/")) for n in nama]
+    for folder in sorted(set(os.path.dirname(r) for r in ress)):
+        os.makedirs(folder, exist_ok=True)
+
+    # Skip the images that are already done with the same threshold and did
+    # not change since (the manifest is written after every image)
+    manifest = Manifest(manifest_path(save_fol_loc), {"threshold": threshold})
+    todo = [(i, img_file[i], r) for i, r in zip(range(mulai, akhir), ress)
+            if args.no_resume or not manifest.done(os.path.relpath(img_file[i], img_loc), [img_file[i]], r)]
+    print(f"{akhir - mulai - len(todo)} image(s) already done, {len(todo)} to process\n")
+    nomor = [i for i, _, _ in todo]
+    nama_todo = [nama[i - mulai] for i in nomor]
+    ress = [r for _, _, r in todo]
+    img_todo = [p for _, p, _ in todo]
+
+    # the results belong to save_fol_loc, like its manifest
+    if (args.results is None):
+        args.results = os.path.join(save_fol_loc, "result-1.csv")
+    if (args.no_resume and os.path.exists(args.results)):
+        os.remove(args.results)
+    log = ResultLog(args.results, KOLOM, "image_name", args.chunk_size)
+
+    # Images done in an earlier run whose row was not written yet (a crash
+    # before the last chunk was written): their row comes from the manifest
+    for i in sorted(set(range(mulai, akhir)) - set(nomor)):
+        name = nama[i - mulai]
+        if (name not in log):
+            rec = manifest.get(os.path.relpath(img_file[i], img_loc))["data"]
+            log.add(result_row(name, rec["pixels"], rec["noise"], rec.get("time")))
+
+    timings = StageLog(args.timings)
+
+    # Print and save the result of one image (after its file is written).
+    # ok: the file was written (stats["ok"]), a failed image is not recorded
+    def selesai(i, img_path, r, stats, ok):
+        if (not ok):
+            print(f"Citra ke-{i} gagal disimpan = {r}\n")
+            return
+        count = stats["noise"]
+        sum_pixel = stats["pixels"]
+        length_process = stats["time"]
+
+        # get the detail of image and print
+        print(f"Proses Citra ke-{i} = {stats['name']}")
+        print(f"Sum of noise = {count} of {sum_pixel} = {count / float(sum_pixel) * 100}%")
+        tahap = stats["stages"]
+        print(f"Candidates per stage: detect = {tahap['detect']}, fuzzy = {tahap['fuzzy']}, propagate = {tahap['propagate']}")
+        print(f"Waktu untuk Proses = {name_of_time(length_process)}\n")
+        if (not stats.get("profiled")):
+            timings.add(stats["name"], stats["times"], length_process, noise=count)
+
+        manifest.record(os.path.relpath(img_path, img_loc), [img_path], r, noise=count, pixels=sum_pixel,
+                        time=length_process)
+
+        # insert the row of this image (written with the next chunk)
+        log.add(result_row(stats["name"], sum_pixel, count, length_process))
+
+    # The profiled image is done here first, the others as usual
+    lain = 0
+    if (args.profile and todo):
+        print(f"Profiling {img_todo[0]}")
+        stats = profile_call(process_image, img_todo[0], ress[0], threshold, args.threads, nama_todo[0],
+                             output=args.profile)
+        # its stage times are not counted (cProfile slows it down)
+        stats["profiled"] = True
+        selesai(nomor[0], img_todo[0], ress[0], stats, stats["ok"])
+        lain = 1
+
+    if (args.workers > 1 and not args.shared):
+        # Every worker reads, filters and writes its own images,
+        # the results come back in the same order as img_file
+        executor = ProcessPoolExecutor(max_workers=args.workers)
+        hasil = executor.map(process_image, img_todo[lain:], ress[lain:], [threshold] * len(ress[lain:]),
+                             [args.threads] * len(ress[lain:]), nama_todo[lain:])
+        for i, img_path, r, stats in zip(nomor[lain:], img_todo[lain:], ress[lain:], hasil):
+            selesai(i, img_path, r, stats, stats["ok"])
+    else:
+        # Read ahead / filter here (--shared: in the worker processes) / write behind
+        executor = ProcessPoolExecutor(max_workers=args.workers) if args.shared else None
+        pipeline = ImagePipeline(args.prefetch, args.writers, read=lambda t: cv2.imread(t[1]))
+        for (i, img_path, r), img, detik in pipeline.images(todo[lain:]):
+            hsl_img, stats = filter_image(img, nama[i - mulai], threshold, args.threads, executor, {"decode": detik})
+            del img
+            pipeline.submit(save_result, r, hsl_img, stats, then=functools.partial(selesai, i, img_path, r, stats))
+        pipeline.close()
+
+    log.close()
+    timings.close()
+    print(timings.report() + "\n")
 
     # save in excel file
-    df.to_excel('result-1.xlsx', sheet_name='Sheet1', index=False)
-
-    print("sudah berhasil disimpan ke dalam excel")
-    '''
-    j = j + 1
\ No newline at end of file
+    if (not args.no_excel):
+        # only the images of this run (rows of other runs can be in the file)
+        build_excel(args.results, 'result-1.xlsx', "image_name", keys=nama)
+        print("sudah berhasil disimpan ke dalam excel")
+
+    manifest.close()
+    if (executor is not None):
+        executor.shutdown()
@@ -2,6 +2,9 @@
 
 import cv2
 import math
+import numpy as np
+
+from fuzzy_table import GK, MEAN_FS, fuzzy_mean, gk, mean_fs
 
 def get_mask(img, x, y, c, h, w):
     # x = h = height
@@ -65,86 +68,18 @@ def get_mean2(arr):
                 hsl = hsl + arr[i][j]
     return hsl / 8
 
+# meanFS and Gk are lookups in the tables of fuzzy_table.py
 def meanFS(n):
-    a = 0
-    b = 3
-    c = 252
-    d = 255
-
-    if (n > a and n < b):
-        return (n - a) / 3
-    elif (n >= b and n <= c):
-        return 1
-    elif (n > c and n < d):
-        return (d - n) / 3
-    else:
-        return 0;
+    return mean_fs(n)
 
 def mX(arr):
-    Trap = 0
-    m_X = arr[1][1]
-    ttl1 = 0
-    ttl2 = 0
-
-    for i in range(3):
-        for j in range(3):
-            Trap = meanFS(arr[i][j])
-            ttl1 = ttl1 + arr[i][j] * Trap
-            ttl2 = ttl2 + Trap
-    
-    if(ttl2 > 0):
-        m_X = ttl1 / ttl2
-    return m_X
+    return float(fuzzy_mean(np.ravel(arr), MEAN_FS))
 
 def Gk(x, k):
-    if (k == 0):
-        if (x <= 14):
-            return 1
-        elif (x > 14 and x < 17):
-            return (17 - x) / 3
-        else:
-            return 0
-    elif (k == 15):
-        if (x >= 241):
-            return 1
-        elif (x > 238 and x < 241):
-            return (241 - x) / 3
-        else:
-            return 0
-    else:
-        a = k * 16 - 2
-        b = k * 16 + 1
-        c = (k + 1) * 16 - 2
-        d = (k + 1) * 16 + 1
-
-        if (x > a and x < b):
-            return (x - a) / 3
-        elif (x >= b and x <= c):
-            return 1
-        elif (x > c and x < d):
-            return (d - x) / 3
-        else:
-            return 0
+    return gk(x, k)
 
 def mKX(arr):
-    Xp = arr[1][1]
-    m_KX = [0] * 16
-
-    for k in range(16):
-        m_KX[k] = Xp
-        ttl1 = 0
-        ttl2 = 0
-        g_k = 0
-
-        for i in range(3):
-            for j in range(3):
-                g_k = Gk(arr[i][j], k)
-                ttl1 = ttl1 + arr[i][j] * g_k
-                ttl2 = ttl2 + g_k
-        
-        if(ttl2 > 0):
-            m_KX[k] = ttl1 / ttl2
-    return m_KX
+    return list(fuzzy_mean(np.ravel(arr), GK))
 
 def Af(m_x, m_k_x):
     min_k = abs(m_x - m_k_x[0])
@@ -1,8 +1,18 @@
 import os
 import numpy as np
-import pandas as pd
 import cv2
 import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from file_index import pair_images, scan_images
+from image_metrics import evaluate_pair
+from image_pipeline import ImagePipeline
+from manifest import Manifest, manifest_path
+from noise_detector import noise_census
+from result_log import ResultLog, build_excel
+from shared_image import attach_shared, create_shared, release_shared, share_array
+from stage_timer import StageLog, profile_call
 
 # Menyesuaikan nama waktu
 def name_of_time(tm):
@@ -13,21 +23,12 @@ def name_of_time(tm):
         tmp = tm % 60
         if(i >= len(waktu)):
             break
-        hasil = f" {int(round(tmp))} {waktu[i]}" + hasil
+        # detik dengan 2 angka desimal (satu citra bisa kurang dari 1 detik)
+        hasil = (f" {tmp:.2f} {waktu[i]}" if i == 0 else f" {int(tmp)} {waktu[i]}") + hasil
         i += 1
         tm = tm // 60
     return hasil
 
-# Mendapatkan semua nama gambar dalam 1 folder
-def get_image_files(directory):
-    image_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff')
-    image_files = []
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.lower().endswith(image_extensions):
-                image_files.append(os.path.join(root, file))
-    return image_files
-
 # Melakukan pengecekan noise
 def check_noise(mask, threshold):
     #print(mask)
@@ -47,20 +48,45 @@ def check_noise(mask, threshold):
     else:
         return False
 
+# Mendapatkan jumlah noise pada baris r0 sampai r1 - 1
+# (mask 3x3 diambil per channel, lihat noise_census)
+def get_sum_of_noise_rows(img, w, r0, r1):
+    _, noise = noise_census(img, 20, r0, r1)
+    return noise
+
 # Mendapatkan jumlah noise pada citra
 def get_sum_of_noise(img, w, h):
-    img_pad = cv2.copyMakeBorder(img, 1, 1, 1, 1, cv2.BORDER_REPLICATE)
-    mask = []
-
-    noise = 0
-    for x in range(h):
-        for y in range(w):
-            for c in range(3):
-                mask = img_pad[x : x + 3, y : y + 3][c]
-
-                if(check_noise(mask, 20)):
-                    noise += 1
-    
+    return get_sum_of_noise_rows(img, w, 0, h)
+
+# Worker: menghitung noise satu bagian citra di shared memory
+# dan menyimpan hasilnya ke blok jumlah[i]
+def count_band(img_desc, count_desc, i, w, r0, r1):
+    shm_img, img = attach_shared(img_desc)
+    shm_count, jumlah = attach_shared(count_desc)
+    jumlah[i] = get_sum_of_noise_rows(img, w, r0, r1)
+
+    del img, jumlah
+    release_shared(shm_img)
+    release_shared(shm_count)
+
+# Mendapatkan jumlah noise pada citra dengan beberapa proses.
+# Citra disimpan satu kali di shared memory, worker hanya menerima
+# deskriptornya (nama, bentuk, tipe data) lalu menghitung per bagian baris
+def get_sum_of_noise_shared(img, w, h, executor, band_rows=64):
+    shm_img, img_shared, img_desc = share_array(img)
+    bagian = [(r0, min(r0 + band_rows, h)) for r0 in range(0, h, band_rows)]
+    shm_count, jumlah, count_desc = create_shared((len(bagian),), np.int64)
+
+    try:
+        jobs = [executor.submit(count_band, img_desc, count_desc, i, w, r0, r1)
+                for i, (r0, r1) in enumerate(bagian)]
+        for job in jobs:
+            job.result()
+        noise = int(jumlah.sum())
+    finally:
+        del img_shared, jumlah
+        release_shared(shm_img, unlink=True)
+        release_shared(shm_count, unlink=True)
     return noise
 
 # Mengecek apakah gambar termasuk blur atau tidak
@@ -79,151 +105,194 @@ def is_image_blurry(image, threshold):
     else:
         return False
 
-# Lokasi Citra
-citra_awal = "D:\\OneDrive - mikroskil.ac.id\\(1) PDP\\2324Genap\\Hasil Pengujian\\citra_uji"
-#citra_hasil_deblurring = "D:\\OneDrive - mikroskil.ac.id\\(1) PDP\\2324Genap\\Jurnal-Image-Enhancement\\dataset\\Hasil-Deblurring"
-citra_hasil_denoising = "D:\\OneDrive - mikroskil.ac.id\\(1) PDP\\2324Genap\\Hasil Pengujian\\citra_hasil"
-
-# Mendapatkan nama file citra
-arr_citra_awal = get_image_files(citra_awal)
-#arr_citra_hasil_deblurring = get_image_files(citra_hasil_deblurring)
-arr_citra_hasil_denoising = get_image_files(citra_hasil_denoising)
-
-# Mendapatkan jumlah citra
-jumlah_citra = len(arr_citra_awal)
-
-# Membuat dataframe
-data = {}
-df = pd.DataFrame(data)
-
-# Deklarasi Array untuk Penyimpanan Data
-
-## Nilai awal
-name_of_image = []
-sum_of_pixel = []
-
-## Before
-#check_blur_before = []
-noise_before = []
-persen_noise_before = []
-
-### After (Deblurring)
-#check_blur_after1 = []
-#noise_after1 = []
-#persen_noise_after1 = []
-
-## After (Denosing)
-#check_blur_after2 = []
-noise_after2 = []
-persen_noise_after2 = []
-
-#Nilai awal dan akhir proses
-awal = 0
-akhir = len(arr_citra_awal)
-
-# Memproses citra
-for i in range(awal, akhir):
-
-    # Memulai waktu awal
-    time_start = time.time()
-
-    # Mendapatkan nama citra
-    image_name = os.path.basename(arr_citra_awal[i])
-    name_of_image += [image_name]
-    print(f"Citra ke-{i}: {image_name} ", end = "")
-
+# Kolom Excel (result1.xlsx)
+KOLOM = [
+    ## Detail awal
+    "Nama Citra", "Jumlah Piksel Citra",
     ## Citra Awal
-
-    # Membaca citra
-    img = cv2.imread(arr_citra_awal[i])
-
-    # Mendapatkan detail dari citra
-    h = img.shape[0]
-    w = img.shape[1]
-    c = img.shape[2]
-
-    # Mendapatkan jumlah piksel 
-    ttl_piksel = h * w * c
-    sum_of_pixel += [ttl_piksel]
-
-    # Mengecek apakah citra termasuk citra kabur atau tidak
-    #blur = "blur image" if is_image_blurry(img, 100) else "non-blur image"
-    #check_blur_before += [blur]
-
-    # Mendapaktan jumlah noise
-    sum_noise = get_sum_of_noise(img, w, h)
-    noise_before += [sum_noise]
-
-    # Mengkonversi jumlah noise menjadi persen
-    persen = sum_noise / ttl_piksel * 100
-    persen_noise_before += [f"{persen}%"]
-
-    
-    ## Citra setelah Deblurring
-
-    # Membaca citra
-    #img = cv2.imread(arr_citra_hasil_deblurring[i])
-
-    # Mengecek apakah citra termasuk citra kabur atau tidak
-    #blur = "blur image" if is_image_blurry(img, 100) else "non-blur image"
-    #check_blur_after1 += [blur]
-
-    # Mendapaktan jumlah noise
-    #sum_noise = get_sum_of_noise(img, w, h)
-    #noise_after1 += [sum_noise]
-
-    # Mengkonversi jumlah noise menjadi persen
-    #persen = sum_noise / ttl_piksel * 100
-    #persen_noise_after1 += [f"{persen}%"]
-
-    
-    ## Citra setelah Denoising
-
-    # Membaca citra
-    img = cv2.imread(arr_citra_hasil_denoising[i])
-
-    # Mengecek apakah citra termasuk citra kabur atau tidak
-    #blur = "blur image" if is_image_blurry(img, 100) else "non-blur image"
-    #check_blur_after2 += [blur]
-
-    # Mendapaktan jumlah noise
-    sum_noise = get_sum_of_noise(img, w, h)
-    noise_after2 += [sum_noise]
-
-    # Mengkonversi jumlah noise menjadi persen
-    persen = sum_noise / ttl_piksel * 100
-    persen_noise_after2 += [f"{persen}%"]
-    
-    # Mendapatkan waktu selesai
-    end_time = time.time()
-
-    # Menghitung lama waktu
-    lengt_process = end_time - time_start
-
-    # Mencetak waktu proses
-    print(f"Waktu proses = {name_of_time(lengt_process)}")
-
-# Memasukkan Data ke dalam Excel
-
-## Detail awal
-df["Nama Citra"] = name_of_image
-df["Jumlah Piksel Citra"] = sum_of_pixel
-
-## Citra Awal
-#df["Blur Awal"] = check_blur_before
-df["Noise Awal"] = noise_before
-df["Persen Noise Awal"] = persen_noise_before
-
-## Setelah Deblurring
-#df["Blur Deblurring"] = check_blur_after1
-#df["Noise Deblurring"] = noise_after1
-#df["Persen Noise Deblurring"] = persen_noise_after1
-
-## Setelah Denoising
-#df["Blur Denoising"] = check_blur_after2
-df["Noise Denoising"] = noise_after2
-df["Persen Noise Denoising"] = persen_noise_after2
-
-# Menyimpan data ke Excel
-df.to_excel('result1.xlsx', sheet_name='Sheet1', index=False)
-print("\nData Berhasil disimpan di Excel")
\ No newline at end of file
+    "Blur Awal", "Laplacian Awal", "Noise Awal", "Persen Noise Awal",
+    ## Setelah Deblurring
+    #"Blur Deblurring", "Noise Deblurring", "Persen Noise Deblurring",
+    ## Setelah Denoising
+    "Blur Denoising", "Laplacian Denoising", "Noise Denoising", "Persen Noise Denoising",
+    ## Perbandingan
+    "PSNR", "SSIM", "Persen Piksel Berubah",
+]
+
+# Satu baris Excel dari hasil evaluate_pair
+def result_row(image_name, ttl_piksel, hasil):
+    return {
+        "Nama Citra": image_name,
+        "Jumlah Piksel Citra": ttl_piksel,
+
+        ## Citra Awal (kabur jika Laplacian < 100, lihat is_image_blurry)
+        "Blur Awal": "blur image" if hasil["laplacian_before"] < 100 else "non-blur image",
+        "Laplacian Awal": hasil["laplacian_before"],
+        "Noise Awal": hasil["noise_before"],
+        "Persen Noise Awal": f"{hasil['noise_before'] / ttl_piksel * 100}%",
+
+        ## Citra setelah Denoising
+        "Blur Denoising": "blur image" if hasil["laplacian_after"] < 100 else "non-blur image",
+        "Laplacian Denoising": hasil["laplacian_after"],
+        "Noise Denoising": hasil["noise_after"],
+        "Persen Noise Denoising": f"{hasil['noise_after'] / ttl_piksel * 100}%",
+
+        ## Perbandingan
+        "PSNR": hasil["psnr"],
+        "SSIM": hasil["ssim"],
+        "Persen Piksel Berubah": f"{hasil['changed_ratio'] * 100}%",
+    }
+
+if __name__ == "__main__":
+    # Jumlah proses untuk menghitung noise (1 = tanpa proses tambahan)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1)
+    # Hitung ulang semua citra walaupun sudah ada di manifest
+    parser.add_argument("--no-resume", action="store_true")
+    # File hasil per citra dan jumlah baris yang ditulis sekaligus
+    parser.add_argument("--results", default="result1.csv")
+    parser.add_argument("--chunk-size", type=int, default=100)
+    # Tidak membuat result1.xlsx (bisa dibuat nanti: python result_log.py result1.csv result1.xlsx)
+    parser.add_argument("--no-excel", action="store_true")
+    # Waktu tiap tahap (decode dan tiap nilai pengujian) per citra sebagai JSON lines,
+    # tabel ringkasannya selalu dicetak di akhir
+    parser.add_argument("--timings", default=None)
+    # Citra pertama yang dihitung dijalankan dengan cProfile dan tracemalloc (disimpan di file ini)
+    parser.add_argument("--profile", nargs="?", const="profile.pstats", default=None)
+    # Jumlah pasangan citra yang dibaca lebih dulu (thread) selama satu pasangan dihitung (0 = tidak)
+    parser.add_argument("--prefetch", type=int, default=4)
+    args = parser.parse_args()
+
+    executor = None
+    if (args.workers > 1):
+        executor = ProcessPoolExecutor(max_workers=args.workers)
+
+    # Lokasi Citra
+    citra_awal = "D:\\OneDrive - mikroskil.ac.id\\(1) PDP\\2324Genap\\Hasil Pengujian\\citra_uji"
+    #citra_hasil_deblurring = "D:\\OneDrive - mikroskil.ac.id\\(1) PDP\\2324Genap\\Jurnal-Image-Enhancement\\dataset\\Hasil-Deblurring"
+    citra_hasil_denoising = "D:\\OneDrive - mikroskil.ac.id\\(1) PDP\\2324Genap\\Hasil Pengujian\\citra_hasil"
+
+    # Mendapatkan nama file citra, dipasangkan berdasarkan path relatif tanpa ekstensi
+    # (AFF-update.py menyimpan hasil dengan susunan folder yang sama: sub/x.jpg -> sub/x.jpg).
+    # Nama yang sama dengan ekstensi lain (x.jpg dan x.png) tidak bisa dipasangkan, dilaporkan saja
+    sama_awal, sama_hasil = [], []
+    pasangan, tidak_ada, lebih = pair_images(scan_images(citra_awal, "stem", duplicates=sama_awal),
+                                             scan_images(citra_hasil_denoising, "stem", duplicates=sama_hasil))
+    #arr_citra_hasil_deblurring = image_paths(citra_hasil_deblurring)
+    for nama in sama_awal:
+        print(f"Citra awal dengan nama yang sama (tidak dipasangkan): {nama}")
+    for nama in sama_hasil:
+        print(f"Citra hasil dengan nama yang sama (tidak dipasangkan): {nama}")
+    for nama in tidak_ada:
+        print(f"Citra hasil tidak ada: {nama}")
+    for nama in lebih:
+        print(f"Citra hasil tanpa citra awal: {nama}")
+    arr_citra_awal = [awal.path for _, awal, _ in pasangan]
+    arr_citra_hasil_denoising = [hasil.path for _, _, hasil in pasangan]
+    kunci = [nama for nama, _, _ in pasangan]
+    nama_citra = [awal.rel for _, awal, _ in pasangan]
+
+    # Nilai citra yang sudah dihitung disimpan di manifest (satu baris per citra),
+    # jadi kalau proses berhenti di tengah jalan tidak perlu dihitung ulang
+    manifest = Manifest(manifest_path("result1.xlsx"), {"threshold": 20})
+
+    # Hasil pengujian ditulis per citra ke result1.csv (per 100 baris),
+    # Excel dibuat dari file tersebut setelah semua citra selesai
+    if (args.no_resume and os.path.exists(args.results)):
+        os.remove(args.results)
+    log = ResultLog(args.results, KOLOM, "Nama Citra", args.chunk_size)
+    timings = StageLog(args.timings)
+    profil = args.profile
+
+    #Nilai awal dan akhir proses
+    awal = 0
+    akhir = len(arr_citra_awal)
+
+    # Citra yang sudah dihitung sebelumnya (tidak perlu dibaca lagi)
+    sudah_dihitung = {i: not args.no_resume and
+                         manifest.done(kunci[i], [arr_citra_awal[i], arr_citra_hasil_denoising[i]])
+                      for i in range(awal, akhir)}
+
+    # Citra awal dan citra hasil denoising dibaca di thread lain, beberapa pasangan lebih dulu
+    baca_citra = lambda i: (cv2.imread(arr_citra_awal[i]), cv2.imread(arr_citra_hasil_denoising[i]))
+    pipeline = ImagePipeline(args.prefetch, 0, read=baca_citra)
+    citra = pipeline.images([i for i in range(awal, akhir) if not sudah_dihitung[i]])
+
+    # Memproses citra
+    for i in range(awal, akhir):
+
+        # Memulai waktu awal
+        time_start = time.perf_counter()
+
+        # Mendapatkan nama citra
+        # (path relatif, sama dengan nama file kalau tidak ada subfolder)
+        image_name = nama_citra[i]
+        print(f"Citra ke-{i}: {image_name} ", end = "")
+
+        file_citra = [arr_citra_awal[i], arr_citra_hasil_denoising[i]]
+        sudah = sudah_dihitung[i]
+        if (sudah and image_name in log):
+            # Sudah dihitung dan sudah ada di result1.csv
+            print("sudah ada")
+            continue
+
+        if (sudah):
+            # Sudah dihitung sebelumnya
+            tersimpan = manifest.get(kunci[i])["data"]
+            ttl_piksel = tersimpan["pixels"]
+            hasil = tersimpan["metrics"]
+        else:
+            # Citra awal dan citra hasil denoising (masing-masing dibaca satu kali)
+            _, (img, img_hasil), detik = next(citra)
+            waktu = {"decode": detik}
+
+            # Mendapatkan detail dari citra
+            h = img.shape[0]
+            w = img.shape[1]
+            c = img.shape[2]
+
+            # Mendapatkan jumlah piksel 
+            ttl_piksel = h * w * c
+
+            # Menghitung semua nilai pengujian (noise, blur, PSNR, SSIM, piksel berubah)
+            census = None
+            if (executor is not None):
+                census = lambda citra: get_sum_of_noise_shared(citra, citra.shape[1], citra.shape[0], executor)
+            if (profil):
+                hasil = profile_call(evaluate_pair, img, img_hasil, 20, census, output=profil)
+                # waktunya tidak dihitung (cProfile memperlambat)
+                profil = waktu = None
+            else:
+                hasil = evaluate_pair(img, img_hasil, 20, census, times=waktu)
+
+            manifest.record(kunci[i], file_citra, pixels=ttl_piksel, metrics=hasil)
+
+        # Satu baris Excel
+        log.add(result_row(image_name, ttl_piksel, hasil))
+
+        # Mendapatkan waktu selesai
+        end_time = time.perf_counter()
+
+        # Menghitung lama waktu
+        lengt_process = end_time - time_start
+        if (not sudah and waktu is not None):
+            timings.add(image_name, waktu, lengt_process)
+
+        # Mencetak waktu proses
+        print(f"Waktu proses = {name_of_time(lengt_process)}")
+
+    citra.close()
+    log.close()
+    timings.close()
+    print("\n" + timings.report())
+
+    # Menyimpan data ke Excel
+    if (not args.no_excel):
+        # hanya citra yang dipasangkan di proses ini (result1.csv bisa berisi
+        # baris dari proses atau dataset sebelumnya)
+        jumlah = build_excel(args.results, 'result1.xlsx', "Nama Citra", keys=nama_citra)
+        print(f"\n{jumlah} citra berhasil disimpan di Excel")
+
+    manifest.close()
+    if (executor is not None):
+        executor.shutdown()
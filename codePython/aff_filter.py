@@ -0,0 +1,229 @@
+# Vectorized AFF (adaptive fuzzy filter) for whole images.
+# Same detection and replacement rules as the per-pixel loop in AFF-update.py
+# (get_mask2, cek_noise3, get_mean, get_mean2, mX, mKX, Af), but every rule is
+# computed with NumPy over whole arrays instead of once per (x, y, c).
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from stage_timer import timed
+
+from fuzzy_table import GK, MEAN_FS, fuzzy_mean
+from neighbourhood import get_neighbours
+from noise_detector import CENTER, detect_noise
+from shared_image import attach_shared, create_shared, release_shared
+
+# changed samples followed at a time by _propagate (bounds its memory)
+PROPAGATE_CHUNK = 1 << 16
+
+# optional C version of the whole filter (python setup.py build_ext --inplace)
+try:
+    import aff_native
+except ImportError:
+    aff_native = None
+
+# Replacement value of a noisy sample (get_mean, get_mean2, mX, mKX, Af and
+# the three-way decision of the main loop)
+def aff_values(nb):
+    nb = [np.asarray(v, dtype=np.int64) for v in nb]
+    Xp = nb[CENTER]
+
+    total = sum(nb)
+    rata = total / 9
+    rata2 = (total - Xp) / 8
+
+    m_X = fuzzy_mean(nb, MEAN_FS)
+    m_k_x = fuzzy_mean(nb, GK)
+
+    # Af: the mKX bin closest to mX, first bin wins on ties
+    ind = np.argmin(np.abs(m_X - m_k_x), axis=0)
+    A_f = np.take_along_axis(m_k_x, ind[None], axis=0)[0]
+
+    hasil = np.where(
+        np.floor(np.abs(rata2 - Xp)) >= 250, np.floor(rata2),
+        np.where(np.floor(np.abs(rata - m_X)) < 128, np.floor(m_X), np.floor(A_f)))
+    return hasil.astype(np.uint8)
+
+# Windows (row-major, border replicated) of the samples (x, y, ch) of src,
+# gathered from their coordinates: one array of len(x) values per neighbour.
+# With hasil, the samples before (x, y) in raster order are read from hasil,
+# the way the main loop of AFF-update.py sees them.
+def gather_windows(src, x, y, ch, hasil=None):
+    h, w, c = src.shape
+    flat_src = src.reshape(-1)
+    nb = []
+    for i in range(3):
+        xi = np.clip(x + i - 1, 0, h - 1)
+        for j in range(3):
+            yj = np.clip(y + j - 1, 0, w - 1)
+            pos = (xi * w + yj) * c + ch
+            if (hasil is None):
+                nb += [flat_src[pos]]
+            else:
+                sudah = xi * w + yj < x * w + y
+                nb += [np.where(sudah, hasil.reshape(-1)[pos], flat_src[pos])]
+    return nb
+
+# The main loop of AFF-update.py writes every result straight back into the
+# image it is reading (hsl_img = img[:] is a view), so a window also sees the
+# already filtered values of the samples before it in raster order.
+# The first two stages run on the original image; this stage recomputes only
+# the samples whose earlier neighbours changed, until nothing changes anymore.
+# The changed samples are taken `chunk` at a time, lowest raster index first
+# (a sample only depends on the samples before it, so this reaches the same
+# result), so the memory does not grow with the number of noisy samples.
+# Return the number of samples recomputed.
+def _propagate(src, hasil, noise, threshold, chunk=None):
+    h, w, c = src.shape
+    chunk = chunk or PROPAGATE_CHUNK
+    flat_src = src.reshape(-1)
+    flat_hsl = hasil.reshape(-1)
+    flat_noise = noise.reshape(-1)
+
+    jumlah = 0
+    # changed samples still to be followed, sorted by raster index
+    pending = np.flatnonzero(flat_hsl != flat_src)
+    while (pending.size > 0):
+        changed, pending = pending[:chunk], pending[chunk:]
+        x, y, ch = np.unravel_index(changed, src.shape)
+
+        # samples later in raster order that have a changed sample in their window
+        dirty = []
+        for dx, dy in [(0, 1), (1, -1), (1, 0), (1, 1)]:
+            ok = (x + dx < h) & (y + dy >= 0) & (y + dy < w)
+            dirty += [((x[ok] + dx) * w + y[ok] + dy) * c + ch[ok]]
+        dirty = np.unique(np.concatenate(dirty))
+        jumlah += dirty.size
+
+        nb = gather_windows(src, *np.unravel_index(dirty, src.shape), hasil)
+        noise_baru, _ = detect_noise(nb, threshold)
+        nilai = nb[CENTER].copy()
+        if (noise_baru.any()):
+            nilai[noise_baru] = aff_values([v[noise_baru] for v in nb])
+        del nb
+
+        flat_noise[dirty] = noise_baru
+        baru = dirty[nilai != flat_hsl[dirty]]
+        flat_hsl[dirty] = nilai
+        if (baru.size > 0):
+            pending = np.union1d(pending, baru)
+    return jumlah
+
+# Filter the rows r0..r1-1 of src into hasil/noise in two stages.
+# Stage 1 is the noise map of the band, read with a 1-pixel halo so its
+# windows are the same as the windows of the whole image. Stage 2 gathers
+# only the flagged samples and runs the fuzzy rules on that compact list.
+# Return the number of candidates of stage 2 (times: seconds per stage are added to it).
+def _filter_band(src, hasil, noise, r0, r1, threshold, times=None):
+    a = max(r0 - 1, 0)
+    b = min(r1 + 1, src.shape[0])
+    with timed(times, "pad"):
+        nb = [v[r0 - a:r1 - a] for v in get_neighbours(src[a:b])]
+    with timed(times, "detect"):
+        noise[r0:r1], _ = detect_noise(nb, threshold)
+        hasil[r0:r1] = src[r0:r1]
+
+    with timed(times, "fuzzy"):
+        idx = np.flatnonzero(noise[r0:r1]) + r0 * src[0].size
+        if (idx.size > 0):
+            nb = gather_windows(src, *np.unravel_index(idx, src.shape))
+            hasil.reshape(-1)[idx] = aff_values(nb)
+    return idx.size
+
+# Denoise a whole image (H x W x C or H x W, uint8) with the AFF rules.
+# Return the filtered image and the number of noisy samples found.
+# When aff_native is built (and native is True) it does the whole image in
+# one pass, about 10x faster than the NumPy path (the propagation follows
+# the raster order, which NumPy can only do in rounds). Otherwise the image is filtered in bands of band_rows rows
+# (default: one band, or 256 rows when workers > 1) by a pool of `workers`
+# threads; NumPy releases the GIL in the heavy calls. The result is the same
+# on every path.
+# If a dict is given as stats, it gets the number of samples each stage
+# handled: "detect" (noise map), "fuzzy" (candidates) and "propagate".
+# If a dict is given as times, it gets the seconds of every stage: "pad",
+# "detect", "fuzzy" and "propagate" ("native" for the C version, which does
+# them all in one pass). With threads the band times are summed over the
+# threads, so they can add up to more than the wall clock time.
+def aff_denoise(img, threshold=20, workers=1, band_rows=None, native=True, stats=None, times=None):
+    src = np.ascontiguousarray(img, dtype=np.uint8)
+    if (src.ndim == 2):
+        hasil, count = aff_denoise(src[:, :, None], threshold, workers, band_rows, native, stats, times)
+        return hasil[:, :, 0], count
+
+    if (native and aff_native is not None):
+        hasil = np.empty_like(src)
+        with timed(times, "native"):
+            count = aff_native.denoise(src, hasil, *src.shape, float(threshold), MEAN_FS, GK)
+        if (stats is not None):
+            stats.update(detect=src.size, fuzzy=count, propagate=0)
+        return hasil, count
+
+    h = src.shape[0]
+    if (band_rows is None):
+        band_rows = 256 if workers > 1 else h
+    bands = [(r0, min(r0 + band_rows, h)) for r0 in range(0, h, band_rows)]
+
+    hasil = np.empty_like(src)
+    noise = np.empty(src.shape, dtype=bool)
+    if (workers > 1 and len(bands) > 1):
+        # every band times into its own dict, added up afterwards
+        band_times = [{} if times is not None else None for _ in bands]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            kandidat = sum(executor.map(lambda band, t: _filter_band(src, hasil, noise, *band, threshold, t),
+                                        bands, band_times))
+        for t in band_times:
+            for name, seconds in (t or {}).items():
+                times[name] = times.get(name, 0.0) + seconds
+    else:
+        kandidat = sum(_filter_band(src, hasil, noise, r0, r1, threshold, times) for r0, r1 in bands)
+
+    with timed(times, "propagate"):
+        ulang = _propagate(src, hasil, noise, threshold)
+    if (stats is not None):
+        stats.update(detect=src.size, fuzzy=kandidat, propagate=ulang)
+    return hasil, int(noise.sum())
+
+# Worker of aff_denoise_shared: filter one band of the shared image straight
+# into the shared output blocks. Return the number of candidates
+def _filter_band_shared(src_desc, hasil_desc, noise_desc, r0, r1, threshold):
+    shm_src, src = attach_shared(src_desc)
+    shm_hsl, hasil = attach_shared(hasil_desc)
+    shm_noise, noise = attach_shared(noise_desc)
+    kandidat = _filter_band(src, hasil, noise, r0, r1, threshold)
+
+    del src, hasil, noise
+    release_shared(shm_src)
+    release_shared(shm_hsl)
+    release_shared(shm_noise)
+    return kandidat
+
+# aff_denoise for an image that is already in shared memory (H x W x C).
+# The bands are filtered by the worker processes of `executor`, which only
+# receive the descriptors; the result is written into the hasil_desc block.
+# Return the number of noisy samples found (stats: same as aff_denoise;
+# times: "bands" is the wall clock time of the worker processes, then "propagate").
+def aff_denoise_shared(src_desc, hasil_desc, executor, threshold=20, band_rows=256, stats=None, times=None):
+    shm_src, src = attach_shared(src_desc)
+    shm_hsl, hasil = attach_shared(hasil_desc)
+    shm_noise, noise, noise_desc = create_shared(src.shape, bool)
+
+    try:
+        h = src.shape[0]
+        bands = [(r0, min(r0 + band_rows, h)) for r0 in range(0, h, band_rows)]
+        with timed(times, "bands"):
+            jobs = [executor.submit(_filter_band_shared, src_desc, hasil_desc, noise_desc, r0, r1, threshold)
+                    for r0, r1 in bands]
+            kandidat = sum(job.result() for job in jobs)
+
+        with timed(times, "propagate"):
+            ulang = _propagate(src, hasil, noise, threshold)
+        count = int(noise.sum())
+        if (stats is not None):
+            stats.update(detect=src.size, fuzzy=kandidat, propagate=ulang)
+    finally:
+        del src, hasil, noise
+        release_shared(shm_src)
+        release_shared(shm_hsl)
+        release_shared(shm_noise, unlink=True)
+    return count
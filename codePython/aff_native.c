@@ -0,0 +1,181 @@
+/*
+ * Native AFF filter: the per-pixel loop of AFF-update.py (get_mask2,
+ * cek_noise3, get_mean, get_mean2, mX, mKX, Af and the three-way decision)
+ * in one pass over the image, without the GIL.
+ *
+ * Build with:  python setup.py build_ext --inplace
+ * aff_filter.py falls back to the NumPy version when this is not built.
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <math.h>
+#include <string.h>
+
+/* 3x3 window of sample (x, y, ch), row-major, border replicated like
+ * cv2.copyMakeBorder(..., BORDER_REPLICATE) */
+static void get_mask(const unsigned char *img, Py_ssize_t h, Py_ssize_t w,
+                     Py_ssize_t c, Py_ssize_t x, Py_ssize_t y, Py_ssize_t ch,
+                     int mask[9])
+{
+    int n = 0;
+    for (Py_ssize_t i = x - 1; i <= x + 1; i++) {
+        Py_ssize_t xi = i < 0 ? 0 : (i >= h ? h - 1 : i);
+        for (Py_ssize_t j = y - 1; j <= y + 1; j++) {
+            Py_ssize_t yj = j < 0 ? 0 : (j >= w ? w - 1 : j);
+            mask[n++] = img[(xi * w + yj) * c + ch];
+        }
+    }
+}
+
+/* cek_noise3: the center differs from the median by more than threshold.
+ * Like np.delete(mask, len(mask)//2) the median leaves out mask[1]. */
+static int cek_noise(const int mask[9], double threshold)
+{
+    int v[8];
+    int n = 0;
+
+    for (int i = 0; i < 9; i++) {
+        if (i != 1)
+            v[n++] = mask[i];
+    }
+    for (int i = 1; i < 8; i++) {
+        int tmp = v[i];
+        int j = i - 1;
+        while (j >= 0 && v[j] > tmp) {
+            v[j + 1] = v[j];
+            j--;
+        }
+        v[j + 1] = tmp;
+    }
+
+    double median = (v[3] + v[4]) / 2.0;
+    return fabs(mask[4] - median) > threshold;
+}
+
+/* Weighted mean of the window with a membership table (mX or one bin of
+ * mKX), or the center when no sample belongs to it. Same summation order
+ * as the Python loops, so the doubles are the same. */
+static double fuzzy_mean(const int mask[9], const double *table)
+{
+    double ttl1 = 0.0;
+    double ttl2 = 0.0;
+
+    for (int i = 0; i < 9; i++) {
+        double g = table[mask[i]];
+        ttl1 = ttl1 + mask[i] * g;
+        ttl2 = ttl2 + g;
+    }
+    if (ttl2 > 0)
+        return ttl1 / ttl2;
+    return mask[4];
+}
+
+/* Replacement value of a noisy sample */
+static int aff_value(const int mask[9], const double *mean_fs, const double *gk)
+{
+    int Xp = mask[4];
+    int total = 0;
+
+    for (int i = 0; i < 9; i++)
+        total += mask[i];
+    double rata = total / 9.0;
+    double rata2 = (total - Xp) / 8.0;
+
+    double m_X = fuzzy_mean(mask, mean_fs);
+
+    /* Af: the mKX bin closest to mX, first bin wins on ties */
+    double A_f = 0.0;
+    double min_k = 0.0;
+    for (int k = 0; k < 16; k++) {
+        double m_k_x = fuzzy_mean(mask, gk + 256 * k);
+        double selisih = fabs(m_X - m_k_x);
+        if (k == 0 || min_k > selisih) {
+            min_k = selisih;
+            A_f = m_k_x;
+        }
+    }
+
+    if (floor(fabs(rata2 - Xp)) >= 250)
+        return (int)floor(rata2);
+    if (floor(fabs(rata - m_X)) < 128)
+        return (int)floor(m_X);
+    return (int)floor(A_f);
+}
+
+/* denoise(src, out, h, w, c, threshold, mean_fs, gk) -> noise count
+ *
+ * src, out: contiguous uint8 buffers of h * w * c samples
+ * mean_fs:  float64 table (256,), gk: float64 table (16, 256)
+ *
+ * Every result is written into out before the next sample is read, in
+ * raster order, exactly like the main loop of AFF-update.py does through
+ * hsl_img = img[:]. */
+static PyObject *denoise(PyObject *self, PyObject *args)
+{
+    Py_buffer src, out, mean_fs, gk;
+    Py_ssize_t h, w, c;
+    double threshold;
+    Py_ssize_t count = 0;
+
+    if (!PyArg_ParseTuple(args, "y*w*nnndy*y*", &src, &out, &h, &w, &c,
+                          &threshold, &mean_fs, &gk))
+        return NULL;
+
+    if (h < 0 || w < 0 || c < 1 || src.len < h * w * c || out.len < h * w * c) {
+        PyErr_SetString(PyExc_ValueError, "src/out do not hold h * w * c samples");
+        goto error;
+    }
+    if (mean_fs.len != 256 * sizeof(double) || gk.len != 16 * 256 * sizeof(double)) {
+        PyErr_SetString(PyExc_ValueError, "mean_fs must be (256,) and gk (16, 256) float64");
+        goto error;
+    }
+
+    unsigned char *img = out.buf;
+    const double *fs = mean_fs.buf;
+    const double *g = gk.buf;
+
+    Py_BEGIN_ALLOW_THREADS
+    memmove(img, src.buf, h * w * c);
+    for (Py_ssize_t x = 0; x < h; x++) {
+        for (Py_ssize_t y = 0; y < w; y++) {
+            for (Py_ssize_t ch = 0; ch < c; ch++) {
+                int mask[9];
+                get_mask(img, h, w, c, x, y, ch, mask);
+                if (!cek_noise(mask, threshold))
+                    continue;
+                count++;
+                img[(x * w + y) * c + ch] = (unsigned char)aff_value(mask, fs, g);
+            }
+        }
+    }
+    Py_END_ALLOW_THREADS
+
+    PyBuffer_Release(&src);
+    PyBuffer_Release(&out);
+    PyBuffer_Release(&mean_fs);
+    PyBuffer_Release(&gk);
+    return PyLong_FromSsize_t(count);
+
+error:
+    PyBuffer_Release(&src);
+    PyBuffer_Release(&out);
+    PyBuffer_Release(&mean_fs);
+    PyBuffer_Release(&gk);
+    return NULL;
+}
+
+static PyMethodDef aff_native_methods[] = {
+    {"denoise", denoise, METH_VARARGS,
+     "denoise(src, out, h, w, c, threshold, mean_fs, gk) -> noise count"},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef aff_native_module = {
+    PyModuleDef_HEAD_INIT, "aff_native", "Native AFF filter", -1, aff_native_methods
+};
+
+PyMODINIT_FUNC PyInit_aff_native(void)
+{
+    return PyModule_Create(&aff_native_module);
+}
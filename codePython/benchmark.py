@@ -0,0 +1,262 @@
+# Benchmark of the AFF filter (AFF-update.py), the noise census
+# (Pengujian.py) and optionally the deblurring (codeDeblurImage/deblur.py).
+#
+# Images: synthetic salt-and-pepper and Gaussian-noise images at 256x256,
+# 1080p and 4K (always the same, seeded), plus hollywood.jpg and hasi.png of
+# codeDeblurImage. Every result is compared with benchmark_golden.json, so a
+# faster version that changes the output is reported as FAIL.
+#
+#   python benchmark.py                          all sizes, results in benchmark-<commit>.json
+#   python benchmark.py --sizes 256 --repeat 5
+#   python benchmark.py --compare benchmark-abc1234.json   speed-up against an earlier run
+#   python benchmark.py --update-golden          freeze the current outputs (only after checking them)
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import aff_filter
+from Pengujian import get_sum_of_noise
+from neighbourhood import get_windows
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEBLUR_DIR = os.path.join(HERE, "..", "codeDeblurImage")
+GOLDEN = os.path.join(HERE, "benchmark_golden.json")
+
+# (width, height)
+SIZES = {"256": (256, 256), "1080p": (1920, 1080), "4k": (3840, 2160)}
+FILES = ["hollywood.jpg", "hasi.png"]
+
+# number of pixels timed one by one for the per-pixel functions
+SAMPLES = 2000
+
+def load_aff_update():
+    # AFF-update.py can not be imported by name (the "-")
+    spec = importlib.util.spec_from_file_location("AFF_update", os.path.join(HERE, "AFF-update.py"))
+    modul = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modul)
+    return modul
+
+def sha256(data):
+    return hashlib.sha256(np.ascontiguousarray(data).tobytes()).hexdigest()
+
+# Smooth color image with some edges and texture (the noise is added on top)
+def base_image(w, h, rng):
+    y, x = np.mgrid[0:h, 0:w].astype(np.float32)
+    img = np.empty((h, w, 3), np.float32)
+    img[:, :, 0] = 128 + 100 * np.sin(x / w * 6.0) * np.cos(y / h * 4.0)
+    img[:, :, 1] = 255 * x / w
+    img[:, :, 2] = 255 * y / h
+    # blocks with sharp edges
+    blok = max(w, h) // 8
+    img[(x // blok + y // blok) % 2 == 1] *= 0.6
+    img += rng.normal(0, 4, img.shape).astype(np.float32)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+def salt_pepper(img, rng, amount=0.05):
+    img = img.copy()
+    titik = rng.random(img.shape[:2])
+    img[titik < amount / 2] = 0
+    img[titik > 1 - amount / 2] = 255
+    return img
+
+def gaussian(img, rng, sigma=20):
+    return np.clip(img + rng.normal(0, sigma, img.shape), 0, 255).astype(np.uint8)
+
+# All benchmark images: name -> BGR uint8 array
+def make_images(sizes):
+    images = {}
+    for size in sizes:
+        w, h = SIZES[size]
+        rng = np.random.default_rng(w * h)
+        base = base_image(w, h, rng)
+        images[f"salt_pepper_{size}"] = salt_pepper(base, rng)
+        images[f"gaussian_{size}"] = gaussian(base, rng)
+    for nama in FILES:
+        img = cv2.imread(os.path.join(DEBLUR_DIR, nama))
+        if (img is not None):
+            images[os.path.splitext(nama)[0]] = img
+    return images
+
+# Run fn() `repeat` times. Return (list of seconds, last result)
+def timed(fn, repeat):
+    waktu = []
+    hasil = None
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        hasil = fn()
+        waktu.append(time.perf_counter() - time_start)
+    return waktu, hasil
+
+# Per-pixel functions of AFF-update.py on the same SAMPLES pixels of img.
+# Yield (name, function to time); the list it returns is the output to check
+def pixel_benchmarks(aff, img):
+    rng = np.random.default_rng(1)
+    h, w, c = img.shape
+    titik = list(zip(rng.integers(0, h, SAMPLES).tolist(), rng.integers(0, w, SAMPLES).tolist(),
+                     rng.integers(0, c, SAMPLES).tolist()))
+    windows = get_windows(img)
+    masks = [aff.get_mask2(windows, x, y, ch) for x, y, ch in titik]
+    m_x = [aff.mX(m) for m in masks]
+    m_k_x = [aff.mKX(m) for m in masks]
+
+    yield "get_mask2", lambda: [aff.get_mask2(windows, x, y, ch) for x, y, ch in titik]
+    yield "cek_noise3", lambda: [aff.cek_noise3(m, 20) for m in masks]
+    yield "mX", lambda: [aff.mX(m) for m in masks]
+    yield "mKX", lambda: [aff.mKX(m) for m in masks]
+    yield "Af", lambda: [aff.Af(a, b) for a, b in zip(m_x, m_k_x)]
+
+# Output of a per-pixel function as something to compare with the golden file
+def pixel_output(hasil):
+    return hashlib.sha256(repr([np.asarray(v).tolist() for v in hasil]).encode()).hexdigest()
+
+def deblur_available():
+    sys.path.insert(0, DEBLUR_DIR)
+    try:
+        import deblur
+    except ImportError:
+        return None
+    return deblur if deblur.available() else None
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True).stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+def run(sizes, repeat, with_deblur, backends=("numpy", "native")):
+    aff = load_aff_update()
+    golden = {}
+    if (os.path.exists(GOLDEN)):
+        with open(GOLDEN) as f:
+            golden = json.load(f)
+
+    hasil = []
+    outputs = {}
+
+    # status: OK / FAIL against the golden output, NEW (not frozen yet),
+    # INPUT (the image decodes differently here) or - (nothing to check)
+    def catat(name, case, waktu, output, per_call=1, golden_name=None):
+        key = f"{golden_name or name}/{case}"
+        expected = golden.get(key)
+        if (output is None):
+            status = "-"
+        elif (expected is None):
+            status = "NEW"
+        elif (beda_input):
+            status = "INPUT"
+        else:
+            status = "OK" if expected == output else "FAIL"
+        outputs[key] = output
+        key = f"{name}/{case}"
+        hasil.append({"name": name, "case": case, "seconds": waktu, "per_call": per_call,
+                      "best": min(waktu) / per_call, "median": statistics.median(waktu) / per_call,
+                      "status": status})
+        print(f"{key:45s} best {min(waktu) / per_call * 1e3:12.4f} ms  "
+              f"median {statistics.median(waktu) / per_call * 1e3:12.4f} ms  {status}")
+
+    images = make_images(sizes)
+    deblur = deblur_available() if with_deblur else None
+    if (with_deblur and deblur is None):
+        print("deblur_native is not built (make deblur_native in codeDeblurImage), no deblur benchmark")
+
+    for case, img in images.items():
+        # the decoded file itself (another JPEG decoder gives other pixels)
+        outputs[f"input/{case}"] = sha256(img)
+        beda_input = golden.get(f"input/{case}", outputs[f"input/{case}"]) != outputs[f"input/{case}"]
+        if (beda_input):
+            print(f"{case}: the image decodes differently than for the golden file, its outputs are not comparable")
+
+        for name, fn in pixel_benchmarks(aff, img):
+            waktu, out = timed(fn, repeat)
+            catat(name, case, waktu, pixel_output(out), SAMPLES)
+
+        filters = [("aff_numpy", False)] if "numpy" in backends else []
+        if ("native" in backends and aff_filter.aff_native is not None):
+            filters.append(("aff_native", True))
+        for name, native in filters:
+            waktu, (filtered, count) = timed(lambda: aff_filter.aff_denoise(img, 20, native=native), repeat)
+            # both backends give the same image, so they share the golden value
+            catat(name, case, waktu, {"image": sha256(filtered), "noise": int(count)}, 1, "aff_denoise")
+
+        h, w = img.shape[:2]
+        waktu, count = timed(lambda: get_sum_of_noise(img, w, h), repeat)
+        catat("get_sum_of_noise", case, waktu, int(count))
+
+        if (deblur is not None and img.shape[0] * img.shape[1] <= 1 << 20):
+            # FFTW_MEASURE plans differ from run to run, nothing to compare
+            waktu, _ = timed(lambda: deblur.deblur_image(img, 7, 9, multiscale=False), repeat)
+            catat("deblur_image", case, waktu, None)
+
+    return hasil, outputs, {"aff_native": aff_filter.aff_native is not None, "deblur": deblur is not None}
+
+# Print the speed-up of every entry against an earlier results file
+def compare(hasil, path):
+    with open(path) as f:
+        lama = {(r["name"], r["case"]): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {path} (best time, > 1 = faster now)")
+    for r in hasil:
+        sebelum = lama.get((r["name"], r["case"]))
+        if (sebelum is not None):
+            print(f"{r['name'] + '/' + r['case']:45s} {sebelum['best'] / r['best']:8.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="256,1080p,4k", help="synthetic sizes: " + ",".join(SIZES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None, help="default: benchmark-<commit>.json")
+    parser.add_argument("--compare", default=None, help="results file of an earlier run")
+    # the NumPy filter takes minutes on the 4K Gaussian image
+    parser.add_argument("--backends", default="numpy,native", help="whole-image filters to time")
+    parser.add_argument("--deblur", action="store_true", help="also time deblur.deblur_image (256x256 and the files)")
+    parser.add_argument("--update-golden", action="store_true")
+    args = parser.parse_args()
+
+    sizes = [s for s in args.sizes.split(",") if s]
+    commit = git_commit()
+    hasil, outputs, available = run(sizes, args.repeat, args.deblur, args.backends.split(","))
+
+    output = args.output or f"benchmark-{commit}.json"
+    with open(output, "w") as f:
+        json.dump({
+            "commit": commit,
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+            "available": available,
+            "results": hasil,
+        }, f, indent=1)
+    print(f"\nResults saved in {output}")
+
+    if (args.compare):
+        compare(hasil, args.compare)
+
+    if (args.update_golden):
+        golden = {}
+        if (os.path.exists(GOLDEN)):
+            with open(GOLDEN) as f:
+                golden = json.load(f)
+        golden.update({k: v for k, v in outputs.items() if v is not None})
+        with open(GOLDEN, "w") as f:
+            json.dump(golden, f, indent=1, sort_keys=True)
+        print(f"Golden outputs saved in {GOLDEN}")
+
+    gagal = [r for r in hasil if r["status"] == "FAIL"]
+    if (gagal):
+        print(f"\n{len(gagal)} output(s) differ from the golden file")
+        sys.exit(1)
@@ -0,0 +1,147 @@
+# Denoise a video with the AFF filter frame by frame, straight from
+# cv2.VideoCapture to cv2.VideoWriter (or to lossless PNG frames), without
+# writing the frames to JPEG first like ekstrakImage.py + AFF-update.py.
+#
+# reader thread -> bounded queue -> filter workers -> ordered writer
+#
+# Contoh:
+#   python denoiseVideo.py video.mp4 hasil.avi --workers 4
+#   python denoiseVideo.py video.mp4 folder_hasil --workers 4
+
+import argparse
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from aff_filter import aff_denoise
+
+# extension -> codec of the output video (FFV1 is lossless)
+VIDEO_CODEC = {
+    ".avi": "FFV1",
+    ".mkv": "FFV1",
+    ".mp4": "mp4v",
+}
+
+# Read the frames of cap in a separate thread into a bounded queue and yield
+# (frame number, frame) in order. When the queue is full the reader waits,
+# so at most queue_size decoded frames are held here.
+def read_frames(cap, queue_size):
+    antrian = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def baca():
+        n = 0
+        while (not stop.is_set()):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            antrian.put((n, frame))
+            n += 1
+        antrian.put(None)
+
+    thread = threading.Thread(target=baca, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = antrian.get()
+            if item is None:
+                break
+            yield item
+    finally:
+        # let the reader finish if we stop early
+        stop.set()
+        while (thread.is_alive()):
+            try:
+                antrian.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+# Writes the filtered frames, either into a video file or as PNG frames
+class FrameWriter:
+    def __init__(self, output, fps):
+        self.output = output
+        self.fps = fps
+        self.video = None
+        self.codec = VIDEO_CODEC.get(os.path.splitext(output)[1].lower())
+        if (self.codec is None):
+            os.makedirs(output, exist_ok=True)
+
+    def write(self, n, frame):
+        if (self.codec is None):
+            cv2.imwrite(f"{self.output}/frame_{n}.png", frame)
+            return
+
+        if (self.video is None):
+            h, w = frame.shape[:2]
+            fourcc = cv2.VideoWriter_fourcc(*self.codec)
+            self.video = cv2.VideoWriter(self.output, fourcc, self.fps, (w, h))
+            if (not self.video.isOpened()):
+                raise RuntimeError(f"cannot open video writer for {self.output} ({self.codec})")
+        self.video.write(frame)
+
+    def close(self):
+        if (self.video is not None):
+            self.video.release()
+
+# Denoise every frame of video_path into output.
+# At most queue_size frames wait in the read queue and at most
+# workers + queue_size frames are being filtered or waiting to be written,
+# so memory stays the same for any video length.
+# Return (number of frames, total noise, seconds)
+def denoise_video(video_path, output, workers=4, queue_size=8, threshold=20, report_every=100):
+    cam = cv2.VideoCapture(video_path)
+    if (not cam.isOpened()):
+        raise RuntimeError(f"cannot open video {video_path}")
+
+    fps = cam.get(cv2.CAP_PROP_FPS) or 30
+    writer = FrameWriter(output, fps)
+
+    time_start = time.perf_counter()
+    jumlah_frame = 0
+    total_noise = 0
+
+    # frames are submitted in order and written in the same order
+    pending = deque()
+    def tulis_satu():
+        nonlocal jumlah_frame, total_noise
+        n, job = pending.popleft()
+        hasil, count = job.result()
+        writer.write(n, hasil)
+        jumlah_frame += 1
+        total_noise += count
+        if (report_every and jumlah_frame % report_every == 0):
+            lama = time.perf_counter() - time_start
+            print(f"Frame {jumlah_frame}: {jumlah_frame / lama:.2f} fps")
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for n, frame in read_frames(cam, queue_size):
+                pending.append((n, executor.submit(aff_denoise, frame, threshold)))
+                if (len(pending) >= workers + queue_size):
+                    tulis_satu()
+            while (pending):
+                tulis_satu()
+    finally:
+        cam.release()
+        writer.close()
+
+    return jumlah_frame, total_noise, time.perf_counter() - time_start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("video", help="input video")
+    parser.add_argument("output", help="output video (.avi/.mkv/.mp4) or folder for PNG frames")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue", type=int, default=8, help="frames read ahead")
+    parser.add_argument("--threshold", type=float, default=20)
+    args = parser.parse_args()
+
+    print(f"Video yang diproses = {args.video}")
+    frames, noise, lama = denoise_video(args.video, args.output, args.workers, args.queue, args.threshold)
+    fps = frames / lama if lama > 0 else 0
+    print(f"Total = {frames} frame, noise = {noise}, {lama:.2f} second = {fps:.2f} fps")
@@ -1,52 +1,177 @@
 import cv2
 import os
+import argparse
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 ##Get FPS from Video
 
-## Declare variabel for file name
-#video = 'video name'
+# Nomor frame (mulai dari 0) yang diambil: setiap n frame
+def frames_every_n(n):
+    i = n - 1
+    while True:
+        yield i
+        i += n
 
-# Declare variabel for directory name
-video_dir = "video directory"
+# Nomor frame yang diambil untuk FPS target (satu frame tiap 1 / target_fps detik).
+# fps dan target_fps harus > 0 (kalau tidak, nomor frame tidak pernah naik)
+def frames_target_fps(fps, target_fps):
+    if (not (fps > 0 and target_fps > 0)):
+        raise ValueError(f"fps ({fps}) dan target fps ({target_fps}) harus lebih dari 0")
+    k = 0
+    terakhir = -1
+    while True:
+        i = int(round(k * fps / target_fps))
+        if (i > terakhir):
+            yield i
+            terakhir = i
+        k += 1
 
-for entry in os.listdir(video_dir):
-    if os.path.isfile(os.path.join(video_dir, entry)):
-        print(f"\nVideo yang diproses = {entry}\n")
+# Nomor frame untuk daftar waktu (detik)
+def frames_timestamps(fps, timestamps):
+    if (not fps > 0):
+        raise ValueError(f"FPS video tidak diketahui ({fps}), frame per detik tidak bisa dicari")
+    return sorted(set(int(round(t * fps)) for t in timestamps))
 
-        proses_video = video_dir + "/" + entry
-        # Get Video with opencv
-        cam = cv2.VideoCapture(proses_video)
+# Mengambil frame dengan nomor yang diminta (urut naik).
+# Frame yang dilewati hanya di-grab() (tanpa retrieve), dan kalau jaraknya
+# lebih dari seek_gap frame langsung loncat dengan CAP_PROP_POS_FRAMES.
+# Menghasilkan (nomor frame, frame)
+def extract_frames(cam, nomor_frame, seek_gap=100):
+    posisi = 0
+    for i in nomor_frame:
+        if (i - posisi > seek_gap):
+            cam.set(cv2.CAP_PROP_POS_FRAMES, i)
+            posisi = i
+        while (posisi < i):
+            if not cam.grab():
+                return
+            posisi += 1
 
-        # Get FPS from video
-        fps = cam.get(cv2.CAP_PROP_FPS)
+        ret, frame = cam.read()
+        if not ret:
+            return
+        posisi += 1
+        yield i, frame
 
-        print(f"FPS from video is = {fps}")
+# Nomor frame yang diambil sesuai pilihan (tanpa pilihan: semua frame).
+# Kalau FPS video tidak diketahui (CAP_PROP_FPS = 0), target_fps diabaikan
+# dan semua frame diambil
+def pilih_frame(fps, every_n=None, target_fps=None, timestamps=None):
+    if (timestamps is not None):
+        return frames_timestamps(fps, timestamps)
+    if (target_fps is not None and fps > 0):
+        return frames_target_fps(fps, target_fps)
+    return frames_every_n(every_n or 1)
+
+# Menyimpan satu frame (dijalankan di thread penulis)
+def simpan_frame(output_file, frame, verbose):
+    cv2.imwrite(output_file, frame)
+    if (verbose):
+        print(f"Frame has been extracted and saved as {output_file}")
+
+# Ekstrak satu video ke {output_root}/{video_name}_frames.
+# Decode di thread ini, encode + tulis JPEG di thread pool. Paling banyak
+# queue_size frame menunggu ditulis, jadi memori tetap kecil.
+# Return (nama video, jumlah frame, detik)
+def extract_video(proses_video, output_root, every_n=None, target_fps=None, timestamps=None,
+                  seek_gap=100, writers=2, queue_size=16, verbose=True):
+    time_start = time.perf_counter()
+
+    # Get Video with opencv
+    cam = cv2.VideoCapture(proses_video)
 
-        ##Convert Video to Image
+    # Get FPS from video
+    fps = cam.get(cv2.CAP_PROP_FPS)
+    if (verbose):
+        print(f"FPS from video is = {fps}")
+    if (target_fps is not None and not fps > 0):
+        print(f"FPS of {proses_video} is unknown, every frame is extracted instead of {target_fps} fps")
 
-        # Count the Image
-        frame_count = 0
+    # Get Video Name
+    video_name = os.path.splitext(os.path.basename(proses_video))[0]
 
-        # Get Video Name
-        video_name = os.path.splitext(os.path.basename(proses_video))[0]
+    # Create an output folder with a name corresponding to the video
+    output_directory = f"{output_root}/{video_name}_frames"
+    os.makedirs(output_directory, exist_ok=True)
 
-        # Create an output folder with a name corresponding to the video
-        output_directory = f"../../hasil_video/{video_name}_frames"
-        os.makedirs(output_directory, exist_ok=True)
+    jumlah_frame = 0
+    pending = deque()
+    try:
+        with ThreadPoolExecutor(max_workers=writers) as executor:
+            nomor_frame = pilih_frame(fps, every_n, target_fps, timestamps)
+            for i, frame in extract_frames(cam, nomor_frame, seek_gap):
+                # Count the Image (mulai dari 1)
+                frame_count = i + 1
 
-        while True:
-            ret, frame = cam.read()
-                
-            if not ret:
-                break
-                
-            frame_count += 1
-                
-            # Only extract frames at the desired frame rate
-            if frame_count % int(cam.get(5) / fps) == 0:
                 output_file = f"{output_directory}/frame_{frame_count}.jpg"
-                cv2.imwrite(output_file, frame)
-                print(f"Frame {frame_count} has been extracted and saved as {output_file}")
-            
+                pending.append(executor.submit(simpan_frame, output_file, frame, verbose))
+                jumlah_frame += 1
+                while (len(pending) >= queue_size or (pending and pending[0].done())):
+                    pending.popleft().result()
+            while (pending):
+                pending.popleft().result()
+    finally:
         cam.release()
-        cv2.destroyAllWindows()
\ No newline at end of file
+
+    return video_name, jumlah_frame, time.perf_counter() - time_start
+
+# Tipe argparse untuk bilangan > 0
+def positive(tipe):
+    def cek(teks):
+        nilai = tipe(teks)
+        if (not nilai > 0):
+            raise argparse.ArgumentTypeError(f"harus lebih dari 0: {teks}")
+        return nilai
+    return cek
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--every-n", type=positive(int), help="ambil 1 frame tiap n frame")
+    parser.add_argument("--target-fps", type=positive(float), help="ambil frame sebanyak target fps")
+    parser.add_argument("--timestamps", help="ambil frame pada detik tertentu, contoh: 1.5,3,10")
+    parser.add_argument("--seek-gap", type=int, default=100, help="loncat (seek) kalau jarak frame lebih dari ini")
+    parser.add_argument("--processes", type=int, default=1, help="jumlah video yang di-decode bersamaan")
+    parser.add_argument("--writers", type=int, default=2, help="thread penulis JPEG per video")
+    parser.add_argument("--queue", type=int, default=16, help="frame maksimal yang menunggu ditulis")
+    args = parser.parse_args()
+
+    ## Declare variabel for file name
+    #video = 'video name'
+
+    # Declare variabel for directory name
+    video_dir = "video directory"
+
+    # Folder hasil
+    output_root = "../../hasil_video"
+
+    timestamps = None
+    if (args.timestamps is not None):
+        timestamps = [float(t) for t in args.timestamps.split(",")]
+
+    daftar_video = [video_dir + "/" + entry for entry in sorted(os.listdir(video_dir))
+                    if os.path.isfile(os.path.join(video_dir, entry))]
+
+    time_start = time.perf_counter()
+    total_frame = 0
+    opsi = dict(every_n=args.every_n, target_fps=args.target_fps, timestamps=timestamps,
+                seek_gap=args.seek_gap, writers=args.writers, queue_size=args.queue)
+
+    if (args.processes > 1):
+        # satu proses per video, hasil dicetak sesuai urutan video
+        with ProcessPoolExecutor(max_workers=args.processes) as executor:
+            jobs = [executor.submit(extract_video, v, output_root, verbose=False, **opsi) for v in daftar_video]
+            for job in jobs:
+                video_name, frames, lama = job.result()
+                total_frame += frames
+                print(f"Video {video_name}: {frames} frame, {lama:.2f} second = {frames / lama if lama > 0 else 0:.2f} fps")
+    else:
+        for proses_video in daftar_video:
+            print(f"\nVideo yang diproses = {os.path.basename(proses_video)}\n")
+            video_name, frames, lama = extract_video(proses_video, output_root, **opsi)
+            total_frame += frames
+            print(f"Video {video_name}: {frames} frame, {lama:.2f} second = {frames / lama if lama > 0 else 0:.2f} fps")
+
+    lama = time.perf_counter() - time_start
+    print(f"Total = {len(daftar_video)} video, {total_frame} frame, {lama:.2f} second = {total_frame / lama if lama > 0 else 0:.2f} fps")
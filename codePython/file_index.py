@@ -0,0 +1,64 @@
+# Index of the images in a folder tree, built with one os.scandir pass.
+# Replaces the os.walk lists of get_image_files: images are looked up by
+# name in a dict, so pairing two folders does not depend on walk order
+# (what PerbedaanCitra.py used to check by hand).
+
+import os
+from collections import namedtuple
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff')
+
+# path: full path, rel: path relative to the scanned folder ("/" separated)
+FileEntry = namedtuple("FileEntry", ["path", "rel", "size", "mtime"])
+
+# Key of an entry: "path" = relative path, "stem" = relative path without
+# the extension (so a.jpg and its result a.png get the same key)
+def entry_key(rel, key="path"):
+    if (key == "stem"):
+        return os.path.splitext(rel)[0]
+    return rel
+
+# Scan directory once. Return a dict key -> FileEntry, sorted by key.
+# Size and mtime come from the scandir entry (no extra stat on Windows).
+# Two files with the same key (a.jpg and a.png with key "stem") raise
+# ValueError, unless a list is given as duplicates: then the key is left
+# out of the index and the relative paths of its files go to the list.
+def scan_images(directory, key="path", extensions=IMAGE_EXTENSIONS, duplicates=None):
+    index = {}
+    sama = {}
+    folder = [("", directory)]
+    while (folder):
+        prefix, path = folder.pop()
+        with os.scandir(path) as isi:
+            for entry in isi:
+                rel = prefix + entry.name
+                # like os.walk, a link to a folder is not followed (no folder
+                # scanned twice, no endless loop) and is not an image either
+                if (entry.is_dir(follow_symlinks=False)):
+                    folder.append((rel + "/", entry.path))
+                elif (entry.name.lower().endswith(extensions) and not entry.is_dir()):
+                    k = entry_key(rel, key)
+                    if (k in index or k in sama):
+                        if (duplicates is None):
+                            raise ValueError(f"{directory}: {index[k].rel} and {rel} have the same key {k!r}")
+                        if (k in index):
+                            sama[k] = [index.pop(k).rel]
+                        sama[k].append(rel)
+                        continue
+                    st = entry.stat()
+                    index[k] = FileEntry(entry.path, rel, st.st_size, st.st_mtime)
+    if (duplicates is not None):
+        duplicates.extend(sorted(rel for rels in sama.values() for rel in rels))
+    return dict(sorted(index.items()))
+
+# All image paths in directory, sorted by relative path
+def image_paths(directory):
+    return [entry.path for entry in scan_images(directory).values()]
+
+# Pair two indexes by key.
+# Return (pairs [(key, entry a, entry b)], keys only in a, keys only in b)
+def pair_images(index_a, index_b):
+    pairs = [(k, entry, index_b[k]) for k, entry in index_a.items() if k in index_b]
+    missing = [k for k in index_a if k not in index_b]
+    extra = [k for k in index_b if k not in index_a]
+    return pairs, missing, extra
@@ -0,0 +1,81 @@
+# Lookup tables for the fuzzy membership functions of the AFF filter.
+# meanFS and Gk only ever get 8-bit values, so they are evaluated once for
+# 0..255 at import time and every later call is a table lookup.
+
+import numpy as np
+
+# trapezoid membership of meanFS (same as meanFS in AFF.py)
+def _mean_fs(n):
+    a = 0
+    b = 3
+    c = 252
+    d = 255
+
+    if (n > a and n < b):
+        return (n - a) / 3
+    elif (n >= b and n <= c):
+        return 1
+    elif (n > c and n < d):
+        return (d - n) / 3
+    else:
+        return 0
+
+# membership of bin k (same as Gk in AFF.py)
+def _gk(x, k):
+    if (k == 0):
+        if (x <= 14):
+            return 1
+        elif (x > 14 and x < 17):
+            return (17 - x) / 3
+        else:
+            return 0
+    elif (k == 15):
+        if (x >= 241):
+            return 1
+        elif (x > 238 and x < 241):
+            return (241 - x) / 3
+        else:
+            return 0
+    else:
+        a = k * 16 - 2
+        b = k * 16 + 1
+        c = (k + 1) * 16 - 2
+        d = (k + 1) * 16 + 1
+
+        if (x > a and x < b):
+            return (x - a) / 3
+        elif (x >= b and x <= c):
+            return 1
+        elif (x > c and x < d):
+            return (d - x) / 3
+        else:
+            return 0
+
+# MEAN_FS[n] = meanFS(n), shape (256,)
+MEAN_FS = np.array([_mean_fs(n) for n in range(256)], dtype=np.float64)
+
+# GK[k, x] = Gk(x, k), shape (16, 256)
+GK = np.array([[_gk(x, k) for x in range(256)] for k in range(16)], dtype=np.float64)
+
+# meanFS for one value or an array of 8-bit values
+def mean_fs(n):
+    return MEAN_FS[n]
+
+# Gk for one value or an array of 8-bit values
+def gk(x, k):
+    return GK[k, x]
+
+# Weighted mean of a 3x3 window with a membership table (MEAN_FS or GK),
+# or the center value when no sample of the window belongs to it.
+# nb holds the 9 samples in row-major order, as values or as arrays of the
+# same shape. With GK the result has one row per bin in front.
+# The sums run in the same order as the loops of mX/mKX so the floats match.
+def fuzzy_mean(nb, table):
+    ttl1 = 0.0
+    ttl2 = 0.0
+    for v in nb:
+        g = table[..., v]
+        ttl1 = ttl1 + v * g
+        ttl2 = ttl2 + g
+    ada = ttl2 > 0
+    return np.where(ada, ttl1 / np.where(ada, ttl2, 1), nb[4])
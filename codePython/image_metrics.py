@@ -0,0 +1,109 @@
+# Before/after metrics for one image pair, from one decode of each image.
+# Every intermediate (grayscale, float planes, difference, noise census) is
+# computed once on first use and shared by all metrics, so a new metric in
+# METRICS only costs its own arithmetic, not another decode or image pass.
+
+from functools import cached_property
+
+import cv2
+import numpy as np
+
+from noise_detector import noise_census
+from stage_timer import timed
+
+# Gaussian window of the SSIM (Wang et al. 2004)
+SSIM_WINDOW = (11, 11)
+SSIM_SIGMA = 1.5
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+
+# One decoded image and its cached intermediates.
+# census: function img -> total noise count (default: noise_census)
+class DecodedImage:
+    def __init__(self, img, threshold=20, census=None):
+        self.img = img
+        self.threshold = threshold
+        self.census = census
+
+    @cached_property
+    def gray(self):
+        if (self.img.ndim == 2):
+            return self.img
+        return cv2.cvtColor(self.img, cv2.COLOR_BGR2GRAY)
+
+    @cached_property
+    def gray_f(self):
+        return self.gray.astype(np.float64)
+
+    @cached_property
+    def noise(self):
+        if (self.census is not None):
+            return self.census(self.img)
+        _, total = noise_census(self.img, self.threshold)
+        return total
+
+    @cached_property
+    def laplacian_var(self):
+        return cv2.Laplacian(self.gray, cv2.CV_64F).var()
+
+    # mean and second moment of the gray image under the SSIM window
+    @cached_property
+    def ssim_moments(self):
+        mu = cv2.GaussianBlur(self.gray_f, SSIM_WINDOW, SSIM_SIGMA)
+        sigma = cv2.GaussianBlur(self.gray_f * self.gray_f, SSIM_WINDOW, SSIM_SIGMA) - mu * mu
+        return mu, sigma
+
+# An original image and its processed result, same size
+class ImagePair:
+    def __init__(self, before, after, threshold=20, census=None):
+        if (before.shape != after.shape):
+            raise ValueError(f"image sizes differ: {before.shape} and {after.shape}")
+        self.before = DecodedImage(before, threshold, census)
+        self.after = DecodedImage(after, threshold, census)
+
+    @cached_property
+    def diff(self):
+        return self.after.img.astype(np.int16) - self.before.img.astype(np.int16)
+
+    @cached_property
+    def mse(self):
+        return np.mean(np.square(self.diff, dtype=np.int32))
+
+def psnr(pair):
+    if (pair.mse == 0):
+        return float("inf")
+    return 10 * np.log10(255 ** 2 / pair.mse)
+
+def ssim(pair):
+    mu1, s11 = pair.before.ssim_moments
+    mu2, s22 = pair.after.ssim_moments
+    s12 = cv2.GaussianBlur(pair.before.gray_f * pair.after.gray_f, SSIM_WINDOW, SSIM_SIGMA) - mu1 * mu2
+    peta = ((2 * mu1 * mu2 + SSIM_C1) * (2 * s12 + SSIM_C2)) / \
+           ((mu1 * mu1 + mu2 * mu2 + SSIM_C1) * (s11 + s22 + SSIM_C2))
+    return float(peta.mean())
+
+# fraction of samples (pixel x channel) that the processing changed
+def changed_ratio(pair):
+    return np.count_nonzero(pair.diff) / pair.diff.size
+
+# name -> function(pair), in the column order of the result
+METRICS = {
+    "noise_before": lambda pair: pair.before.noise,
+    "noise_after": lambda pair: pair.after.noise,
+    "laplacian_before": lambda pair: pair.before.laplacian_var,
+    "laplacian_after": lambda pair: pair.after.laplacian_var,
+    "psnr": psnr,
+    "ssim": ssim,
+    "changed_ratio": changed_ratio,
+}
+
+# All metrics of one pair as a dict (one row of the result).
+# times: dict that gets the seconds of every metric (a shared intermediate
+# counts for the first metric that uses it)
+def evaluate_pair(before, after, threshold=20, census=None, metrics=METRICS, times=None):
+    pair = ImagePair(before, after, threshold, census)
+    hasil = {}
+    for name, fungsi in metrics.items():
+        with timed(times, name):
+            hasil[name] = fungsi(pair)
+    return hasil
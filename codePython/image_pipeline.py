@@ -0,0 +1,130 @@
+# Overlapped read / compute / write for the image-folder loops.
+# A prefetch thread decodes the next `prefetch` images while the main thread
+# processes the current one, and a pool of `writers` threads encodes and
+# saves the results behind it. cv2 releases the GIL while it decodes and
+# encodes, so the three overlap. Both queues are bounded, so at most
+# prefetch + 1 decoded images and max_pending results are in memory.
+#
+#   pipeline = ImagePipeline(prefetch=4, writers=2)
+#   for path, img, seconds in pipeline.images(paths):
+#       hasil = process(img)
+#       pipeline.write(out_path, hasil, then=lambda ok: manifest.record(...))
+#   pipeline.close()
+#
+# The `then` callbacks run in the main thread, in the order of the writes,
+# once their file is saved (so a manifest never marks an unwritten image).
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+_SELESAI = object()
+
+class ImagePipeline:
+    # prefetch / writers: 0 = read / write in the calling thread
+    # read: function item -> decoded image (or anything the loop needs)
+    # writer: function (path, img) used by write()
+    # max_pending: results waiting to be written (default 2 per writer)
+    def __init__(self, prefetch=4, writers=2, read=cv2.imread, writer=cv2.imwrite, max_pending=None):
+        self.prefetch = prefetch
+        self.read = read
+        self.writer = writer
+        self.max_pending = max_pending or 2 * max(writers, 1)
+        self.executor = ThreadPoolExecutor(max_workers=max(writers, 1)) if writers > 0 else None
+        # (future, then) in the order of the writes
+        self.pending = deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Yield (item, read(item), seconds of the read) for every item, in order,
+    # read up to `prefetch` items ahead. An error of read is raised here.
+    def images(self, items):
+        if (self.prefetch <= 0):
+            for item in items:
+                time_start = time.perf_counter()
+                data = self.read(item)
+                yield item, data, time.perf_counter() - time_start
+            return
+
+        antrian = queue.Queue(maxsize=self.prefetch)
+        berhenti = threading.Event()
+
+        # wait for room in the queue, unless the loop stopped early
+        def kirim(hasil):
+            while (not berhenti.is_set()):
+                try:
+                    antrian.put(hasil, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def baca():
+            for item in items:
+                time_start = time.perf_counter()
+                try:
+                    hasil = (item, self.read(item), time.perf_counter() - time_start, None)
+                except Exception as e:
+                    hasil = (item, None, 0.0, e)
+                if (not kirim(hasil)):
+                    return
+            kirim(_SELESAI)
+
+        thread = threading.Thread(target=baca, daemon=True)
+        thread.start()
+        try:
+            while (True):
+                hasil = antrian.get()
+                if (hasil is _SELESAI):
+                    break
+                item, data, seconds, error = hasil
+                if (error is not None):
+                    raise error
+                yield item, data, seconds
+        finally:
+            berhenti.set()
+            thread.join()
+
+    # Run fn(*args) on a writer thread; then(result of fn) runs later in this
+    # thread. Blocks while max_pending results are still being written.
+    def submit(self, fn, *args, then=None):
+        if (self.executor is None):
+            hasil = fn(*args)
+            if (then is not None):
+                then(hasil)
+            return
+        while (len(self.pending) >= self.max_pending):
+            self._finish_oldest()
+        self.pending.append((self.executor.submit(fn, *args), then))
+        self.poll()
+
+    # Save img to path with the writer function (cv2.imwrite by default)
+    def write(self, path, img, then=None):
+        self.submit(self.writer, path, img, then=then)
+
+    # Run the callbacks of the writes that are finished (in order)
+    def poll(self):
+        while (self.pending and self.pending[0][0].done()):
+            self._finish_oldest()
+
+    def _finish_oldest(self):
+        future, then = self.pending.popleft()
+        hasil = future.result()
+        if (then is not None):
+            then(hasil)
+
+    # Wait for all writes and run their callbacks
+    def close(self):
+        while (self.pending):
+            self._finish_oldest()
+        if (self.executor is not None):
+            self.executor.shutdown()
+            self.executor = None
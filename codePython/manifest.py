@@ -0,0 +1,85 @@
+# Resumable batch runs.
+# Every finished image is appended as one JSON line (input signature,
+# parameters, output, extra data) and flushed to disk right away, so after
+# a crash or Ctrl+C the next run skips everything that is already done and
+# still up to date. A half-written last line is ignored when loading.
+
+import hashlib
+import json
+import os
+
+# Manifest file for an output folder or file: "<output>.manifest.jsonl"
+def manifest_path(output):
+    return output.rstrip("/\\") + ".manifest.jsonl"
+
+# Signature of an input file: size + mtime, or the SHA-256 of the content
+def file_signature(path, use_hash=False):
+    if (use_hash):
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for blok in iter(lambda: f.read(1 << 20), b""):
+                h.update(blok)
+        return {"sha256": h.hexdigest()}
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": st.st_mtime}
+
+class Manifest:
+    # params: everything that changes the result (threshold, kernel size, ...)
+    def __init__(self, path, params, use_hash=False):
+        self.path = path
+        self.params = params
+        self.use_hash = use_hash
+        self.records = {}
+
+        if (os.path.exists(path)):
+            with open(path, encoding="utf-8") as f:
+                for baris in f:
+                    try:
+                        rec = json.loads(baris)
+                    except json.JSONDecodeError:
+                        # the line that was being written when the run died
+                        continue
+                    self.records[rec["key"]] = rec
+
+        self.file = open(path, "a", encoding="utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def signatures(self, files):
+        return [file_signature(f, self.use_hash) for f in files]
+
+    # The stored record of key, or None
+    def get(self, key):
+        return self.records.get(key)
+
+    # True if key was done with the same parameters, from inputs that did
+    # not change since, and its output (if any) still exists. With output
+    # given, the record must also point to that output file.
+    def done(self, key, files, output=None):
+        rec = self.records.get(key)
+        if (rec is None or rec["params"] != self.params):
+            return False
+        if (output is not None and rec["output"] != output):
+            return False
+        if (rec["output"] is not None and not os.path.exists(rec["output"])):
+            return False
+        try:
+            return rec["inputs"] == self.signatures(files)
+        except OSError:
+            return False
+
+    # Mark key as done and write it to disk before returning
+    def record(self, key, files, output=None, **data):
+        rec = {"key": key, "inputs": self.signatures(files), "params": self.params,
+               "output": output, "data": data}
+        self.records[key] = rec
+        self.file.write(json.dumps(rec) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
@@ -0,0 +1,24 @@
+# 3x3 neighbourhood of every pixel, padded once per image.
+# get_mask2 used to call cv2.copyMakeBorder on the whole image for every
+# (x, y, c); here the image is padded one time and every window is a view.
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Pad the image by 1 pixel on every side, same as
+# cv2.copyMakeBorder(img, 1, 1, 1, 1, cv2.BORDER_REPLICATE)
+def pad_image(img):
+    pad = [(1, 1), (1, 1)] + [(0, 0)] * (img.ndim - 2)
+    return np.pad(img, pad, mode="edge")
+
+# Get the 3x3 window of every pixel as a zero-copy view.
+# For a H x W x C image: windows[x, y, c] is the mask of get_mask2(img, x, y, c)
+def get_windows(img):
+    return sliding_window_view(pad_image(img), (3, 3), axis=(0, 1))
+
+# Get the 9 neighbours (row-major, index 4 is the center) of every sample,
+# each one a H x W (x C) view of the same padded image
+def get_neighbours(img):
+    img_pad = pad_image(img)
+    h, w = img.shape[:2]
+    return [img_pad[i:i + h, j:j + w] for i in range(3) for j in range(3)]
@@ -0,0 +1,64 @@
+# Median-of-8 noise detector (cek_noise3 / Pengujian.check_noise) for whole
+# image planes. The median comes from a fixed min/max sorting network on the
+# 8-bit planes, so there is no np.delete / np.median per pixel.
+# tests/test_noise_census.py compares it with the per-pixel loop.
+
+import numpy as np
+
+from neighbourhood import get_neighbours
+
+# index (row-major) of the center pixel in the 3x3 window
+CENTER = 4
+
+# cek_noise3 removes mask[len(mask)//2] before taking the median. The mask is
+# 3x3, so that is flat index 1 (top middle) and the center stays in the median.
+SKIP_MEDIAN = 1
+
+# Optimal sorting network for 8 values (19 compare-exchange in 6 layers),
+# without the two last-layer pairs (1, 2) and (5, 6): they do not touch the
+# middle values 3 and 4, which is all the median needs
+NETWORK = [
+    (0, 2), (1, 3), (4, 6), (5, 7),
+    (0, 4), (1, 5), (2, 6), (3, 7),
+    (0, 1), (2, 3), (4, 5), (6, 7),
+    (2, 4), (3, 5),
+    (1, 4), (3, 6),
+    (3, 4),
+]
+
+# The 4th and 5th smallest of 8 planes of the same shape
+def middle_of_8(planes):
+    v = [np.array(p) for p in planes]
+    tmp = np.empty_like(v[0])
+    for a, b in NETWORK:
+        np.minimum(v[a], v[b], out=tmp)
+        np.maximum(v[a], v[b], out=v[b])
+        v[a], tmp = tmp, v[a]
+    return v[3], v[4]
+
+# Noise detection of cek_noise3 for many samples at once.
+# nb: the 9 samples of the 3x3 windows (row-major), as arrays of one shape.
+# Return the noise map and the median image (even count: mean of the two
+# middle values, like np.median)
+def detect_noise(nb, threshold):
+    s3, s4 = middle_of_8([nb[i] for i in range(9) if i != SKIP_MEDIAN])
+    jumlah = np.add(s3, s4, dtype=np.int32)
+    selisih = np.abs(2 * np.asarray(nb[CENTER], dtype=np.int32) - jumlah)
+    return selisih > 2 * threshold, jumlah / 2
+
+# Noise census of rows r0 .. r1 - 1 of an image (all rows by default), with
+# the 3x3 windows taken per channel.
+# Return (count per channel, total count)
+def noise_census(img, threshold=20, r0=0, r1=None):
+    h = img.shape[0]
+    if (r1 is None):
+        r1 = h
+
+    # one row above and below the band, so the windows see the real neighbours
+    a = max(r0 - 1, 0)
+    b = min(r1 + 1, h)
+    nb = [p[r0 - a : r1 - a] for p in get_neighbours(img[a:b])]
+    noise, _ = detect_noise(nb, threshold)
+
+    jumlah = noise.reshape(-1, noise.shape[2] if noise.ndim == 3 else 1).sum(axis=0)
+    return jumlah, int(jumlah.sum())
@@ -0,0 +1,143 @@
+# Result table written while the images are processed.
+# Every image is one row appended to a CSV (or JSON lines) file, written in
+# chunks of `chunk_size` rows, so the cost per image does not grow with the
+# dataset and a crash only loses the last unwritten chunk (the manifest
+# still has those images, see Pengujian.py). The Excel summary is built
+# from the file afterwards:
+#   python result_log.py result1.csv result1.xlsx
+
+import argparse
+import csv
+import json
+import os
+
+import pandas as pd
+
+def is_jsonl(path):
+    return path.endswith(".jsonl") or path.endswith(".json")
+
+class ResultLog:
+    # columns: column names in order (the layout of the Excel file)
+    # key: column that identifies an image, a row of the same key is not added twice
+    def __init__(self, path, columns, key=None, chunk_size=100):
+        self.path = path
+        self.columns = list(columns)
+        self.key = key if key is not None else self.columns[0]
+        self.chunk_size = chunk_size
+        self.buffer = []
+        self.keys = set()
+
+        baru = not os.path.exists(path) or os.path.getsize(path) == 0
+        if (not baru):
+            self.keys = set(str(k) for k in read_column(path, self.key))
+
+        self.file = open(path, "a", newline="", encoding="utf-8")
+        if (not baru and not ends_with_newline(path)):
+            # the last line was cut off by a crash, start on a new line
+            self.file.write("\n")
+        if (not is_jsonl(path)):
+            self.writer = csv.DictWriter(self.file, fieldnames=self.columns)
+            if (baru):
+                self.writer.writeheader()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # True if the image already has a row
+    def __contains__(self, key):
+        return str(key) in self.keys
+
+    # Add the row of one image (written with the next chunk)
+    def add(self, row):
+        self.keys.add(str(row[self.key]))
+        self.buffer.append(row)
+        if (len(self.buffer) >= self.chunk_size):
+            self.flush()
+
+    def flush(self):
+        if (not self.buffer):
+            return
+        if (is_jsonl(self.path)):
+            for row in self.buffer:
+                self.file.write(json.dumps({c: row.get(c) for c in self.columns}) + "\n")
+        else:
+            self.writer.writerows(self.buffer)
+        self.buffer = []
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+def ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+# Rows of a JSON lines result file
+def read_jsonl(path):
+    hasil = []
+    with open(path, encoding="utf-8") as f:
+        for baris in f:
+            try:
+                hasil.append(json.loads(baris))
+            except json.JSONDecodeError:
+                # a line cut off by a crash
+                continue
+    return hasil
+
+# Complete rows of a CSV result file.
+# A row cut off by a crash has missing fields (None), it is left out
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [row for row in csv.DictReader(f) if None not in row and None not in row.values()]
+
+# A CSV value back as int or float when it is a number (exactly as written)
+def parse_value(v):
+    for tipe in (int, float):
+        try:
+            return tipe(v)
+        except ValueError:
+            pass
+    return v
+
+# Values of one column of a result file
+def read_column(path, column):
+    rows = read_jsonl(path) if is_jsonl(path) else read_csv(path)
+    return [row[column] for row in rows]
+
+# Read a result file as a DataFrame (last row of every key)
+def read_results(path, key=None):
+    if (is_jsonl(path)):
+        df = pd.DataFrame(read_jsonl(path))
+    else:
+        df = pd.DataFrame([{k: parse_value(v) for k, v in row.items()} for row in read_csv(path)])
+    if (len(df.columns) > 0):
+        df = df.drop_duplicates(subset=key if key is not None else df.columns[0], keep="last")
+    return df
+
+# Build the Excel summary from a result file.
+# keys: only the rows of these images, in this order (the images of the
+# current run; the file can still hold rows of an earlier run or dataset)
+def build_excel(path, xlsx_path, key=None, sheet_name="Sheet1", keys=None):
+    df = read_results(path, key)
+    if (keys is not None and len(df.columns) > 0):
+        urutan = {str(k): i for i, k in enumerate(keys)}
+        nomor = df[key if key is not None else df.columns[0]].astype(str).map(urutan)
+        df = df[nomor.notna()].iloc[nomor.dropna().argsort(kind="stable")]
+    df.to_excel(xlsx_path, sheet_name=sheet_name, index=False)
+    return len(df)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("results")
+    parser.add_argument("xlsx")
+    parser.add_argument("--key", default=None)
+    args = parser.parse_args()
+
+    jumlah = build_excel(args.results, args.xlsx, args.key)
+    print(f"{jumlah} row(s) saved in {args.xlsx}")
@@ -0,0 +1,15 @@
+# Build the optional native AFF filter (aff_native.c) next to the scripts:
+#   python setup.py build_ext --inplace
+# Without it aff_filter.py uses the NumPy version.
+
+import sys
+
+from setuptools import Extension, setup
+
+# keep a * b + c as two roundings, so the C results match Python exactly
+extra_compile_args = [] if sys.platform == "win32" else ["-ffp-contract=off"]
+
+setup(
+    name="aff-native",
+    ext_modules=[Extension("aff_native", ["aff_native.c"], extra_compile_args=extra_compile_args)],
+)
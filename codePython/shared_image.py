@@ -0,0 +1,37 @@
+# Images in shared memory for the process-pool paths.
+# The parent puts an image in a multiprocessing.shared_memory block and only
+# sends its descriptor (name, shape, dtype) to the workers, so the pixels are
+# never pickled and every worker sees the same buffer.
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Create an empty shared block for an array.
+# Return the block, the array on top of it and its descriptor
+def create_shared(shape, dtype):
+    dtype = np.dtype(dtype)
+    shape = tuple(int(n) for n in shape)
+    size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    return shm, arr, (shm.name, shape, dtype.str)
+
+# Copy an array (e.g. a decoded image) into a new shared block
+def share_array(arr):
+    shm, shared, desc = create_shared(arr.shape, arr.dtype)
+    shared[...] = arr
+    return shm, shared, desc
+
+# Open a shared block from its descriptor (in a worker).
+# Return the block and the array on top of it
+def attach_shared(desc):
+    name, shape, dtype = desc
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+# Close a block; the process that created it also removes it
+def release_shared(shm, unlink=False):
+    shm.close()
+    if (unlink):
+        shm.unlink()
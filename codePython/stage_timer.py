@@ -0,0 +1,93 @@
+# Time spent in every stage of a batch run (decode, detect, encode, ...).
+# The stages of one image are timed with time.perf_counter into a plain dict
+# (so worker processes can send it back with their result), then added to a
+# StageLog that writes one JSON line per image and prints a breakdown table
+# at the end of the run. profile_call runs one image under cProfile and
+# tracemalloc.
+
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Add the time of the block to times[name] (if times is not None)
+@contextmanager
+def timed(times, name):
+    time_start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if (times is not None):
+            times[name] = times.get(name, 0.0) + time.perf_counter() - time_start
+
+class StageLog:
+    # path: JSON lines file of the events (None = only the table)
+    def __init__(self, path=None):
+        self.file = open(path, "a", encoding="utf-8") if path else None
+        self.total = {}
+        self.count = {}
+        self.images = 0
+        self.seconds = 0.0
+        self.time_start = time.perf_counter()
+
+    # The stage times of one image (seconds: its whole time, None = sum of the stages)
+    def add(self, image, times, seconds=None, **data):
+        if (seconds is None):
+            seconds = sum(times.values())
+        for name, t in times.items():
+            self.total[name] = self.total.get(name, 0.0) + t
+            self.count[name] = self.count.get(name, 0) + 1
+        self.images += 1
+        self.seconds += seconds
+        if (self.file is not None):
+            event = {"event": "image", "image": image, "seconds": seconds, "stages": times}
+            event.update(data)
+            self.file.write(json.dumps(event) + "\n")
+            self.file.flush()
+
+    # Breakdown table: total, mean per image and share of every stage
+    def report(self):
+        lama = time.perf_counter() - self.time_start
+        baris = [f"{'stage':16s} {'images':>7s} {'total s':>10s} {'mean ms':>10s} {'share':>7s}"]
+        semua = sum(self.total.values())
+        for name in sorted(self.total, key=self.total.get, reverse=True):
+            t = self.total[name]
+            baris.append(f"{name:16s} {self.count[name]:7d} {t:10.3f} {t / self.count[name] * 1e3:10.2f} "
+                         f"{t / semua * 100 if semua > 0 else 0:6.1f}%")
+        baris.append(f"{self.images} image(s), {self.seconds:.3f} s in the images, {lama:.3f} s wall clock"
+                     + (f", {self.images / lama:.3f} image/s" if lama > 0 else ""))
+        return "\n".join(baris)
+
+    def close(self):
+        if (self.file is not None):
+            self.file.write(json.dumps({"event": "summary", "images": self.images,
+                                        "wall_seconds": time.perf_counter() - self.time_start,
+                                        "stages": self.total}) + "\n")
+            self.file.close()
+            self.file = None
+
+# Run fn(*args) under cProfile and tracemalloc, print the top functions
+# (cumulative time) and the peak memory, save the profile to `output`
+# (open it with python -m pstats). Return the result of fn
+def profile_call(fn, *args, output="profile.pstats", top=25):
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    try:
+        hasil = profiler.runcall(fn, *args)
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    profiler.dump_stats(output)
+    teks = io.StringIO()
+    pstats.Stats(profiler, stream=teks).sort_stats("cumulative").print_stats(top)
+    print(teks.getvalue())
+    print(f"Peak memory (Python allocations): {peak / 2**20:.1f} MiB")
+    for stat in snapshot.statistics("lineno")[:10]:
+        print(f"  {stat}")
+    print(f"Profile saved in {output}\n")
+    return hasil
@@ -1,14 +1,10 @@
 import cv2
+import csv
 import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 
-def get_image_files(directory):
-    image_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff')
-    image_files = []
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.lower().endswith(image_extensions):
-                image_files.append(os.path.join(root, file))
-    return image_files
+from file_index import image_paths
 
 ## Lokasi Citra
 citra_awal = "/home/apriyanto/Documents/github/PDP-2024-Apri-2/test"
@@ -16,25 +12,88 @@ citra_awal = "/home/apriyanto/Documents/github/PDP-2024-Apri-2/test"
 ## Lokasi simpan hasil citra
 lok_simpan = "/home/apriyanto/Documents/github/PDP-2024-Apri-2/awal-ubuntu"
 
-## Mendapatkan nama file citra
-arr_citra_awal = get_image_files(citra_awal)
-
 ## Nama hasil proses
 name = "result"
 
-## Proses pergantian nama file
-for i in range(len(arr_citra_awal)):
+## Citra PNG disalin byte per byte (tanpa decode, waktu dan izin file ikut disalin).
+## True = dibuat sebagai hard link ke file aslinya (tanpa salinan di disk).
+## Hati-hati: dengan hard link file hasil dan file asli adalah file yang sama,
+## mengubah satu mengubah yang lain.
+hard_link = False
+
+## Jumlah proses untuk mengubah citra yang bukan PNG menjadi PNG
+workers = os.cpu_count() or 1
+
+## File pasangan nama asli -> nama baru
+file_pasangan = lok_simpan + "/" + name + "-mapping.csv"
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# True jika isi file benar-benar PNG (dilihat dari 8 byte pertama, bukan dari ekstensi)
+def is_png(path):
+    with open(path, "rb") as f:
+        return f.read(len(PNG_SIGNATURE)) == PNG_SIGNATURE
+
+# Membuat file hasil dari citra PNG tanpa decode: salinan byte per byte, atau
+# hard link jika link=True (salinan jika link tidak bisa: beda disk, sistem file tanpa link)
+def link_or_copy(asal, hasil, link=False):
+    if (os.path.lexists(hasil)):
+        os.remove(hasil)
+    if (link):
+        try:
+            os.link(asal, hasil)
+            return "link"
+        except OSError:
+            pass
+    shutil.copy2(asal, hasil)
+    return "copy"
 
-    print(arr_citra_awal[i])
-    # Untuk membaca gambar
-    img = cv2.imread(arr_citra_awal[i])
+# Mengubah citra yang bukan PNG menjadi PNG (dijalankan di proses lain)
+def transcode(asal, hasil):
+    img = cv2.imread(asal)
+    if (img is None):
+        return "gagal"
+    return "transcode" if cv2.imwrite(hasil, img) else "gagal"
+
+if __name__ == "__main__":
+    ## Mendapatkan nama file citra
+    arr_citra_awal = image_paths(citra_awal)
+
+    if (not os.path.exists(lok_simpan)):
+        os.makedirs(lok_simpan)
+
+    if (hard_link):
+        print(f"Peringatan: citra PNG di {lok_simpan} adalah hard link ke {citra_awal}, "
+              f"mengubah file hasil juga mengubah citra asli")
 
     # Untuk lokasi dan nama file yang mau disimpan
-    hasil = lok_simpan + "/" + name + "-" + str(i) + ".png"
+    arr_hasil = [lok_simpan + "/" + name + "-" + str(i) + ".png" for i in range(len(arr_citra_awal))]
+    cara = [None] * len(arr_citra_awal)
+
+    ## Proses pergantian nama file: citra PNG langsung, yang lain diubah di proses lain
+    ubah = []
+    for i in range(len(arr_citra_awal)):
+        if (is_png(arr_citra_awal[i])):
+            cara[i] = link_or_copy(arr_citra_awal[i], arr_hasil[i], hard_link)
+            print(f"{arr_citra_awal[i]} -> {arr_hasil[i]} ({cara[i]})")
+        else:
+            ubah.append(i)
+
+    if (ubah):
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            hasil = executor.map(transcode, [arr_citra_awal[i] for i in ubah], [arr_hasil[i] for i in ubah],
+                                 chunksize=max(1, len(ubah) // (4 * workers)))
+            for i, c in zip(ubah, hasil):
+                cara[i] = c
+                print(f"{arr_citra_awal[i]} -> {arr_hasil[i]} ({c})")
 
-    # Untuk menyimpan hasil perubahan nama citra
-    #cv2.imwrite(img, hasil)
-    print(hasil)
-    cv2.imwrite(hasil, img)
+    # Menyimpan pasangan nama asli dan nama baru
+    with open(file_pasangan, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["original", "new", "method"])
+        for asal, baru, c in zip(arr_citra_awal, arr_hasil, cara):
+            writer.writerow([os.path.relpath(asal, citra_awal), os.path.basename(baru), c])
 
-    print()
\ No newline at end of file
+    print()
+    print(f"{cara.count('link') + cara.count('copy')} PNG tanpa decode, {cara.count('transcode')} diubah ke PNG, "
+          f"{cara.count('gagal')} gagal, pasangan nama di {file_pasangan}")
@@ -0,0 +1,5 @@
+# The modules of codePython are imported by name (they are scripts, not a package)
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
@@ -0,0 +1,200 @@
+# aff_denoise (aff_filter.py) against the per-pixel loop of the first
+# AFF-update.py. The loop writes every pixel back into the image it reads
+# (hsl_img = img[:] is a view), so later windows see filtered values.
+
+import math
+
+import cv2
+import numpy as np
+import pytest
+
+import aff_filter
+from aff_filter import aff_denoise
+
+# The old helpers of AFF-update.py (same rules and arithmetic)
+def cek_noise3(mask, threshold):
+    pixel_value = mask[1][1]
+    mask = np.delete(mask, len(mask)//2)
+    median_value = np.median(mask)
+    return abs(pixel_value - median_value) > threshold
+
+def get_mask2(img, x, y, c):
+    padded_image = cv2.copyMakeBorder(img, 1, 1, 1, 1, cv2.BORDER_REPLICATE)
+    mask = []
+    for i in range(x, x + 3):
+        tmp = []
+        for j in range(y, y + 3):
+            tmp = tmp + [padded_image[i, j, c]]
+        mask = mask + [tmp]
+    return mask
+
+def get_mean(arr):
+    hsl = 0
+    for i in range(3):
+        for j in range(3):
+            hsl = hsl + arr[i][j]
+    return hsl / 9
+
+def get_mean2(arr):
+    hsl = 0
+    for i in range(3):
+        for j in range(3):
+            if(not(i == 1 and j == 1)):
+                hsl = hsl + arr[i][j]
+    return hsl / 8
+
+def meanFS(n):
+    if (n > 0 and n < 3):
+        return n / 3
+    elif (n >= 3 and n <= 252):
+        return 1
+    elif (n > 252 and n < 255):
+        return (255 - n) / 3
+    return 0
+
+def mX(arr):
+    m_X = arr[1][1]
+    ttl1 = 0
+    ttl2 = 0
+    for i in range(3):
+        for j in range(3):
+            Trap = meanFS(arr[i][j])
+            ttl1 = ttl1 + arr[i][j] * Trap
+            ttl2 = ttl2 + Trap
+    if(ttl2 > 0):
+        m_X = ttl1 / ttl2
+    return m_X
+
+def Gk(x, k):
+    if (k == 0):
+        if (x <= 14):
+            return 1
+        elif (x > 14 and x < 17):
+            return (17 - x) / 3
+        return 0
+    elif (k == 15):
+        if (x >= 241):
+            return 1
+        elif (x > 238 and x < 241):
+            return (241 - x) / 3
+        return 0
+    a = k * 16 - 2
+    b = k * 16 + 1
+    c = (k + 1) * 16 - 2
+    d = (k + 1) * 16 + 1
+    if (x > a and x < b):
+        return (x - a) / 3
+    elif (x >= b and x <= c):
+        return 1
+    elif (x > c and x < d):
+        return (d - x) / 3
+    return 0
+
+def mKX(arr):
+    Xp = arr[1][1]
+    m_KX = [0] * 16
+    for k in range(16):
+        m_KX[k] = Xp
+        ttl1 = 0
+        ttl2 = 0
+        for i in range(3):
+            for j in range(3):
+                g_k = Gk(arr[i][j], k)
+                ttl1 = ttl1 + arr[i][j] * g_k
+                ttl2 = ttl2 + g_k
+        if(ttl2 > 0):
+            m_KX[k] = ttl1 / ttl2
+    return m_KX
+
+def Af(m_x, m_k_x):
+    min_k = abs(m_x - m_k_x[0])
+    ind = 0
+    for i in range(1, 16):
+        tmp = abs(m_x - m_k_x[i])
+        if(min_k > tmp):
+            min_k = tmp
+            ind = i
+    return m_k_x[ind]
+
+# The old main loop for one image. Return (filtered image, number of noisy samples)
+def aff_reference(img, threshold=20):
+    img = img.copy()
+    hsl_img = img[:]
+    count = 0
+    for x in range(img.shape[0]):
+        for y in range(img.shape[1]):
+            hsl = [0, 0, 0]
+            for c in range(img.shape[2]):
+                mask = get_mask2(img, x, y, c)
+                if(not(cek_noise3(mask, threshold))):
+                    hsl[c] = mask[1][1]
+                    continue
+                count = count + 1
+
+                rata = get_mean(mask)
+                rata2 = get_mean2(mask)
+                m_k_x = mKX(mask)
+                Xp = img[x, y, c]
+                m_X = mX(mask)
+                A_f = Af(m_X, m_k_x)
+
+                hsl[c] = Xp
+                if(math.floor(abs(rata2 - Xp)) >= 250):
+                    hsl[c] = int(math.floor(rata2))
+                elif(math.floor(abs(rata - m_X)) < 128):
+                    hsl[c] = int(math.floor(m_X))
+                else:
+                    hsl[c] = int(math.floor(A_f))
+            hsl_img[x, y] = [hsl[0], hsl[1], hsl[2]]
+    return hsl_img, count
+
+def salt_pepper_image(rng, shape):
+    img = rng.integers(90, 160, shape, dtype=np.uint8)
+    titik = rng.random(shape[:2])
+    img[titik < 0.1] = 0
+    img[titik > 0.9] = 255
+    return img
+
+def gaussian_image(rng, shape):
+    h, w = shape[:2]
+    dasar = np.add.outer(np.arange(h) * 7, np.arange(w) * 5)[:, :, None] + np.array([0, 60, 120])
+    return np.clip(dasar % 256 + rng.normal(0, 30, shape), 0, 255).astype(np.uint8)
+
+def random_image(rng, shape):
+    return rng.integers(0, 256, shape, dtype=np.uint8)
+
+IMAGES = [salt_pepper_image, gaussian_image, random_image]
+SHAPES = [(1, 1, 3), (2, 9, 3), (9, 2, 3), (13, 17, 3)]
+
+# (name, aff_denoise options, PROPAGATE_CHUNK)
+PATHS = [
+    ("native", dict(native=True), None),
+    ("numpy", dict(native=False), None),
+    ("bands", dict(native=False, workers=2, band_rows=3), None),
+    ("chunk", dict(native=False), 3),
+]
+
+@pytest.fixture(scope="module")
+def references():
+    hasil = {}
+    for make in IMAGES:
+        for shape in SHAPES:
+            img = make(np.random.default_rng(sum(shape)), shape)
+            hasil[make.__name__, shape] = img, aff_reference(img)
+    return hasil
+
+@pytest.mark.parametrize("name, options, chunk", PATHS, ids=[p[0] for p in PATHS])
+@pytest.mark.parametrize("make", IMAGES, ids=lambda f: f.__name__)
+@pytest.mark.parametrize("shape", SHAPES, ids=str)
+def test_aff_denoise_matches_loop(references, monkeypatch, name, options, chunk, make, shape):
+    if (name == "native" and aff_filter.aff_native is None):
+        pytest.skip("aff_native is not built (python setup.py build_ext --inplace)")
+    if (chunk is not None):
+        monkeypatch.setattr(aff_filter, "PROPAGATE_CHUNK", chunk)
+    img, (expected, expected_count) = references[make.__name__, shape]
+    asli = img.copy()
+    hasil, count = aff_denoise(img, 20, **options)
+    assert np.array_equal(hasil, expected)
+    assert count == expected_count
+    # unlike the loop, the input image is left as it is
+    assert np.array_equal(img, asli)
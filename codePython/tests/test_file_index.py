@@ -0,0 +1,57 @@
+# scan_images (file_index.py) against the os.walk listing it replaces
+
+import os
+
+import pytest
+
+from file_index import pair_images, scan_images
+
+# The image paths os.walk finds (relative, "/" separated)
+def walk_images(directory):
+    hasil = []
+    for root, _, files in os.walk(directory):
+        for file in files:
+            if file.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff')):
+                hasil.append(os.path.relpath(os.path.join(root, file), directory).replace(os.sep, "/"))
+    return sorted(hasil)
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x")
+
+def test_scan_images_like_walk(tmp_path):
+    for rel in ["a.png", "b.JPG", "c.txt", "sub/a.png", "sub/deep/d.bmp"]:
+        touch(str(tmp_path / rel))
+    index = scan_images(str(tmp_path))
+    assert list(index) == walk_images(str(tmp_path))
+    assert index["sub/a.png"].path == str(tmp_path / "sub" / "a.png")
+
+def test_scan_images_does_not_follow_folder_links(tmp_path):
+    touch(str(tmp_path / "sub" / "a.png"))
+    try:
+        # a link back to the top folder (a loop) and a second name for sub
+        os.symlink(str(tmp_path), str(tmp_path / "sub" / "loop"), target_is_directory=True)
+        os.symlink(str(tmp_path / "sub"), str(tmp_path / "copy.png"), target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pytest.skip("no symlinks here")
+    assert list(scan_images(str(tmp_path))) == walk_images(str(tmp_path)) == ["sub/a.png"]
+
+def test_scan_images_duplicates(tmp_path):
+    for rel in ["x.jpg", "x.png", "y.jpg"]:
+        touch(str(tmp_path / rel))
+    with pytest.raises(ValueError):
+        scan_images(str(tmp_path), "stem")
+    sama = []
+    index = scan_images(str(tmp_path), "stem", duplicates=sama)
+    assert list(index) == ["y"]
+    assert sama == ["x.jpg", "x.png"]
+
+def test_pair_images(tmp_path):
+    for rel in ["a/p.jpg", "a/sub/q.jpg", "a/r.jpg", "b/p.png", "b/sub/q.png", "b/s.png"]:
+        touch(str(tmp_path / rel))
+    pairs, missing, extra = pair_images(scan_images(str(tmp_path / "a"), "stem"),
+                                        scan_images(str(tmp_path / "b"), "stem"))
+    assert [k for k, _, _ in pairs] == ["p", "sub/q"]
+    assert missing == ["r"]
+    assert extra == ["s"]
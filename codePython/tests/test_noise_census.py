@@ -0,0 +1,77 @@
+# noise_census (noise_detector.py) against the per-pixel loop that
+# Pengujian.py used before it was vectorised.
+
+import numpy as np
+import pytest
+
+from neighbourhood import pad_image
+from noise_detector import noise_census
+
+# The old check_noise of Pengujian.py. np.delete without an axis flattens
+# the 3x3 mask, so it removes flat index len(mask)//2 = 1, not the center
+def check_noise(mask, threshold):
+    pixel_value = mask[1, 1]
+    mask = np.delete(mask, len(mask)//2)
+    median_value = np.median(mask)
+    return abs(pixel_value - median_value) > threshold
+
+# The old get_sum_of_noise loop (border replicated). Return the count per channel
+def census_reference(img, threshold=20):
+    if (img.ndim == 2):
+        img = img[:, :, None]
+    h, w, c = img.shape
+    img_pad = pad_image(img).astype(np.int64)
+    jumlah = np.zeros(c, dtype=np.int64)
+    for x in range(h):
+        for y in range(w):
+            for ch in range(c):
+                if (check_noise(img_pad[x : x + 3, y : y + 3, ch], threshold)):
+                    jumlah[ch] += 1
+    return jumlah
+
+def random_image(rng, shape):
+    return rng.integers(0, 256, shape, dtype=np.uint8)
+
+def flat_image(rng, shape):
+    return np.full(shape, 117, dtype=np.uint8)
+
+def salt_pepper_image(rng, shape):
+    img = np.full(shape, 128, dtype=np.uint8)
+    titik = rng.random(shape[:2])
+    img[titik < 0.05] = 0
+    img[titik > 0.95] = 255
+    return img
+
+# Sharp edges on the first and last rows / columns, where the padding repeats them
+def border_edges_image(rng, shape):
+    img = np.full(shape, 40, dtype=np.uint8)
+    img[0] = 250
+    img[:, -1] = 0
+    img[-1, : shape[1] // 2] = 200
+    img[:, 0] = rng.integers(0, 256, img[:, 0].shape, dtype=np.uint8)
+    return img
+
+IMAGES = [random_image, flat_image, salt_pepper_image, border_edges_image]
+SHAPES = [(1, 1, 3), (1, 7, 3), (5, 3, 3), (17, 23, 3), (31, 2, 1), (13, 11)]
+
+@pytest.mark.parametrize("make", IMAGES, ids=lambda f: f.__name__)
+@pytest.mark.parametrize("shape", SHAPES, ids=str)
+def test_noise_census_matches_loop(make, shape):
+    img = make(np.random.default_rng(sum(shape)), shape)
+    jumlah, total = noise_census(img, 20)
+    expected = census_reference(img, 20)
+    assert np.array_equal(jumlah, expected)
+    assert total == int(expected.sum())
+
+@pytest.mark.parametrize("threshold", [0, 5, 127.5, 255])
+def test_noise_census_thresholds(threshold):
+    img = random_image(np.random.default_rng(7), (9, 14, 3))
+    jumlah, _ = noise_census(img, threshold)
+    assert np.array_equal(jumlah, census_reference(img, threshold))
+
+# The bands of get_sum_of_noise_shared add up to the whole image
+def test_noise_census_bands():
+    img = salt_pepper_image(np.random.default_rng(3), (29, 19, 3))
+    _, total = noise_census(img, 20)
+    bands = [noise_census(img, 20, r0, min(r0 + 4, 29))[1] for r0 in range(0, 29, 4)]
+    assert sum(bands) == total